@@ -0,0 +1,237 @@
+"""
+Benchmark suite for PyLucene Music Search Engine
+Scales music_enriched.csv to synthetic corpora and measures indexing and query performance
+"""
+import lucene
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from indexer import create_index
+from searcher import MusicSearcher, DIFFICULTY_RANGES
+
+def scale_corpus(csv_path, out_path, factor, seed=42):
+    """Write factor perturbed copies of the CSV, returns the number of rows written
+
+    Copy 0 is the original data. Every further copy gets unique keys, jittered
+    year/level values and some words dropped from the long text fields, so the
+    index sees distinct documents with realistic term statistics.
+    """
+    rng = random.Random(seed)
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        rows = list(reader)
+
+    count = 0
+    with open(out_path, 'w', encoding='utf-8', newline='') as out:
+        writer = csv.DictWriter(out, fieldnames=fieldnames)
+        writer.writeheader()
+        for copy in range(factor):
+            for row in rows:
+                if copy:
+                    row = perturb_row(row, copy, rng)
+                writer.writerow(row)
+                count += 1
+    return count
+
+def perturb_row(row, copy, rng):
+    row = dict(row)
+    if row.get('url'):
+        row['url'] = f"{row['url']}#copy{copy}"
+    elif row.get('wiki_title'):
+        row['wiki_title'] = f"{row['wiki_title']} ({copy})"
+
+    if (row.get('year') or '').isdigit():
+        row['year'] = str(int(row['year']) + rng.randint(-5, 5))
+    if (row.get('level') or '').isdigit():
+        row['level'] = str(min(10, max(1, int(row['level']) + rng.randint(-1, 1))))
+
+    for field in ('description', 'summary', 'wiki_paragraph'):
+        if row.get(field):
+            row[field] = ' '.join(word for word in row[field].split() if rng.random() > 0.1)
+    return row
+
+def directory_size(path):
+    """Total size in bytes of all files below path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def latency_stats(latencies, elapsed):
+    """p50/p95/p99/max latency in milliseconds and QPS for one pass"""
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        # Nearest-rank percentile
+        index = max(0, min(len(ordered) - 1, int(round(p / 100.0 * len(ordered))) - 1))
+        return ordered[index] * 1000.0
+
+    return {
+        'queries': len(ordered),
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'max_ms': ordered[-1] * 1000.0,
+        'qps': len(ordered) / elapsed if elapsed > 0 else 0.0
+    }
+
+def build_workload(queries_file, filter_queries=50, seed=42):
+    """Queries from queries.json plus generated filter-heavy queries"""
+    with open(queries_file, 'r') as f:
+        queries = [query['query'] for query in json.load(f)['queries']]
+
+    rng = random.Random(seed)
+    terms = ['', '', 'sonata', 'waltz', 'prelude', 'chopin', 'bach', 'mozart', 'etude', 'nocturne']
+    difficulties = [name for name in DIFFICULTY_RANGES if name != 'medium']
+    for _ in range(filter_queries):
+        start_year = rng.randint(1700, 1920)
+        parts = [rng.choice(terms), f"year:{start_year}-{start_year + rng.choice([5, 10, 25, 50])}"]
+        if rng.random() < 0.7:
+            parts.append(f"difficulty:{rng.choice(difficulties)}")
+        queries.append(' '.join(part for part in parts if part))
+    return queries
+
+def load_logged_queries(log_file, limit=None):
+    """Raw query strings from a query log (JSONL) and its rotated backups, oldest first"""
+    paths = [log_file]
+    backup = 1
+    while os.path.exists(f"{log_file}.{backup}"):
+        paths.insert(0, f"{log_file}.{backup}")
+        backup += 1
+
+    queries = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    query = json.loads(line).get('query')
+                except ValueError:
+                    # A partly written last line after a crash
+                    continue
+                if query:
+                    queries.append(query)
+    return queries[-limit:] if limit else queries
+
+def run_queries(searcher, queries, max_results):
+    latencies = []
+    start = time.perf_counter()
+    for query in queries:
+        query_start = time.perf_counter()
+        searcher.multi_field_search(query, max_results=max_results, fields='display')
+        latencies.append(time.perf_counter() - query_start)
+    return latency_stats(latencies, time.perf_counter() - start)
+
+def measure_queries(index_dir, queries, max_results=10, warm_passes=5):
+    """Cold pass on a freshly opened searcher, then warm passes (result cache disabled)"""
+    searcher = MusicSearcher(index_dir, cache_size=0)
+    try:
+        cold = run_queries(searcher, queries, max_results)
+        warm = [run_queries(searcher, queries, max_results) for _ in range(warm_passes)]
+    finally:
+        searcher.close()
+
+    # Report the median warm pass by p50 to damp outliers
+    warm.sort(key=lambda stats: stats['p50_ms'])
+    return {'cold': cold, 'warm': warm[len(warm) // 2]}
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(csv_path, queries_file, factors, work_dir, threads=1, ram_buffer_mb=64.0, warm_passes=5,
+                  filter_queries=50, keep=False, query_log=None, shards=1):
+    """Benchmark every scale factor, returns a JSON-serializable report
+
+    With query_log the workload is replayed from a query log instead of
+    queries.json plus generated filter queries.
+    """
+    if query_log:
+        queries = load_logged_queries(query_log)
+    else:
+        queries = build_workload(queries_file, filter_queries)
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'threads': threads,
+        'ram_buffer_mb': ram_buffer_mb,
+        'shards': shards,
+        'workload': query_log or 'queries.json',
+        'workload_queries': len(queries),
+        'scales': []
+    }
+
+    for factor in factors:
+        scale_dir = os.path.join(work_dir, f"x{factor}")
+        os.makedirs(scale_dir, exist_ok=True)
+        corpus = os.path.join(scale_dir, 'corpus.csv')
+        index_dir = os.path.join(scale_dir, 'index')
+
+        print(f"\n=== Scale x{factor} ===")
+        rows = scale_corpus(csv_path, corpus, factor)
+        indexing = create_index(corpus, index_dir, threads=threads, ram_buffer_mb=ram_buffer_mb, shards=shards)
+        report['scales'].append({
+            'factor': factor,
+            'rows': rows,
+            'indexing': indexing,
+            'index_bytes': directory_size(index_dir),
+            'search': measure_queries(index_dir, queries, warm_passes=warm_passes)
+        })
+
+        if not keep:
+            shutil.rmtree(scale_dir)
+
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexing and search benchmark on scaled copies of the corpus")
+    parser.add_argument('--csv', default="/data/music_enriched.csv")
+    parser.add_argument('--queries', default="/data/queries.json")
+    parser.add_argument('--scales', default="1,10", help="comma-separated scale factors, e.g. 1,10,100,1000")
+    parser.add_argument('--threads', type=int, default=1, help="indexing worker threads")
+    parser.add_argument('--ram-buffer-mb', type=float, default=64.0)
+    parser.add_argument('--shards', type=int, default=1, help="index shards, searched concurrently")
+    parser.add_argument('--warm-passes', type=int, default=5)
+    parser.add_argument('--filter-queries', type=int, default=50, help="generated filter-heavy queries")
+    parser.add_argument('--query-log', default=None, help="replay queries from this query log (JSONL) as the workload")
+    parser.add_argument('--work-dir', default=None, help="where corpora and indexes are built (default: temp dir)")
+    parser.add_argument('--keep', action='store_true', help="keep generated corpora and indexes")
+    parser.add_argument('--output', default="benchmark.json", help="JSON report path, '-' for stdout")
+    args = parser.parse_args()
+
+    if not lucene.getVMEnv():
+        lucene.initVM()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='music_bench_')
+    factors = [int(factor) for factor in args.scales.split(',')]
+    try:
+        report = run_benchmark(args.csv, args.queries, factors, work_dir, threads=args.threads,
+                               ram_buffer_mb=args.ram_buffer_mb, warm_passes=args.warm_passes,
+                               filter_queries=args.filter_queries, keep=args.keep, query_log=args.query_log,
+                               shards=args.shards)
+    finally:
+        if not args.work_dir and not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output != '-':
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"\n✅ Benchmark report written to {args.output}")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
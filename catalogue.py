@@ -0,0 +1,74 @@
+"""
+PyLucene Music Search Engine - Catalogue numbers
+Extracts normalized catalogue identifiers (Op./No., K., BWV, B., Hob., D., S., WoO)
+from piece names and infobox fields, and recognizes catalogue-shaped queries
+"""
+import re
+
+# Catalogue prefix as written -> normalized scheme
+SCHEMES = {
+    'op': 'op',
+    'opus': 'op',
+    'k': 'k',
+    'kv': 'k',
+    'bwv': 'bwv',
+    'b': 'b',
+    'hob': 'hob',
+    'd': 'd',
+    's': 's',
+    'woo': 'woo'
+}
+
+# "Op. 10 No. 1", "K. 545", "BWV 846", "Hob. XVI: 52", "S . 216", "WoO 81", "op10/1"
+CATALOGUE_PATTERN = re.compile(
+    r'\b(opus|op|kv|k|bwv|hob|woo|b|d|s)\s*\.?\s*'
+    r'((?:[ivxl]+\s*:\s*)?\d+[a-z]?)\b'
+    r'(?:\s*(?:,?\s*no\.?\s*|/)(\d+[a-z]?)\b)?',
+    re.IGNORECASE)
+
+# A bare opus number as in the info_opus column: "25", "25, No. 1", "10/2"
+BARE_OPUS_PATTERN = re.compile(r'^\s*(\d+[a-z]?)(?:\s*(?:,?\s*no\.?\s*|/)(\d+[a-z]?))?', re.IGNORECASE)
+
+def catalogue_id(scheme, number, sub_number=None):
+    """Normalized identifier, e.g. 'bwv 846', 'op 10 no 1', 's 141 no 5', 'hob xvi:52'"""
+    number = re.sub(r'\s+', '', number.lower())
+    if sub_number:
+        return f"{scheme} {number} no {sub_number.lower()}"
+    return f"{scheme} {number}"
+
+def catalogue_ids(text):
+    """All catalogue identifiers in text, in order of appearance without duplicates
+
+    A numbered piece yields both 'op 10 no 1' and 'op 10' ('s 141 no 5' and
+    's 141'), so the whole opus or set is found as well.
+    """
+    ids = []
+    for match in CATALOGUE_PATTERN.finditer(text or ''):
+        scheme = SCHEMES[match.group(1).lower()]
+        if match.group(3):
+            ids.append(catalogue_id(scheme, match.group(2), match.group(3)))
+        ids.append(catalogue_id(scheme, match.group(2)))
+    return list(dict.fromkeys(ids))
+
+def opus_ids(opus):
+    """Identifiers of an info_opus value, which usually leaves out the 'Op.'"""
+    match = BARE_OPUS_PATTERN.match(opus or '')
+    if match:
+        return catalogue_ids(f"Op. {match.group(1)}" + (f" No. {match.group(2)}" if match.group(2) else ''))
+    return catalogue_ids(opus)
+
+def catalogue_query(text):
+    """The identifiers a query asks for if it is nothing but catalogue numbers, else None
+
+    "bwv 846", "Op. 10 No. 1" and "K545, K. 331" qualify; "chopin op 10" does not.
+    Only the most specific identifier of each reference is returned.
+    """
+    ids = []
+    rest = text
+    for match in CATALOGUE_PATTERN.finditer(text):
+        scheme = SCHEMES[match.group(1).lower()]
+        ids.append(catalogue_id(scheme, match.group(2), match.group(3)))
+        rest = rest.replace(match.group(0), ' ', 1)
+    if not ids or re.sub(r'[\s,;&+]|\band\b|\bor\b', '', rest, flags=re.IGNORECASE):
+        return None
+    return list(dict.fromkeys(ids))
@@ -2,147 +2,579 @@
 Indexes music_enriched.csv with Wikipedia-enhanced fields
 """
 import lucene
+import argparse
 import csv
+import hashlib
+import json
+import os
+import re
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
 from pathlib import Path
 from org.apache.lucene.analysis.standard import StandardAnalyzer
-from org.apache.lucene.document import Document, Field, TextField, StringField, StoredField, IntPoint, NumericDocValuesField
-from org.apache.lucene.index import IndexWriter, IndexWriterConfig
+from org.apache.lucene.document import Document, Field, FieldType, TextField, StringField, StoredField, IntPoint, NumericDocValuesField, SortedDocValuesField, KnnFloatVectorField
+from org.apache.lucene.index import VectorSimilarityFunction, IndexWriter, IndexWriterConfig, TieredMergePolicy, LogByteSizeMergePolicy, NoMergePolicy, DirectoryReader, MultiBits, SegmentInfos, SegmentCommitInfo, Term
 from org.apache.lucene.store import FSDirectory
+from org.apache.lucene.facet import FacetsConfig
+from org.apache.lucene.facet.sortedset import SortedSetDocValuesFacetField
+from org.apache.lucene.util import BytesRef
 from java.nio.file import Paths
+from java.util import HashSet
+from lucene import JArray
+from searcher import (DIFFICULTY_RANGES, FACET_DIMS, SHARD_MANIFEST, SIMILAR_FIELDS, KNN_FIELD, CATALOGUE_FIELD,
+                      GROUP_FIELDS, GROUP_SEPARATOR, INDEX_SORT, CURRENT_LINK, build_sort)
+from catalogue import catalogue_ids, opus_ids
+from suggest import collect_suggestions, build_suggester
+from vectors import VectorModel, model_path
 
-def create_index(csv_path, index_dir):
-    """Create Lucene index from music CSV"""
+# Bumped whenever build_document gains a field, so incremental runs rewrite existing documents
+SCHEMA_VERSION = 4
+
+# Rows the vector model is fitted on, the rest of a larger corpus is only encoded
+MAX_FIT_ROWS = 50000
+
+# Merge policies selectable from the command line
+MERGE_POLICIES = {
+    'tiered': lambda: TieredMergePolicy(),
+    'log': lambda: LogByteSizeMergePolicy(),
+    'none': lambda: NoMergePolicy.INSTANCE
+}
+
+def vector_type(base):
+    """Frozen copy of a TextField type that also stores term vectors"""
+    field_type = FieldType(base)
+    field_type.setStoreTermVectors(True)
+    field_type.freeze()
+    return field_type
+
+# TextField types with term vectors, for the SIMILAR_FIELDS "more like this" reads;
+# created on first use, the JVM is not running yet when this module is imported
+TEXT_VECTOR_TYPES = {}
+
+def text_vector_type(stored):
+    field_type = TEXT_VECTOR_TYPES.get(stored)
+    if field_type is None:
+        field_type = vector_type(TextField.TYPE_STORED if stored else TextField.TYPE_NOT_STORED)
+        TEXT_VECTOR_TYPES[stored] = field_type
+    return field_type
+
+def text_field(name, value, store, term_vectors=False):
+    """TextField, with term vectors if requested and name is one of SIMILAR_FIELDS"""
+    if term_vectors and name in SIMILAR_FIELDS:
+        return Field(name, value, text_vector_type(store == Field.Store.YES))
+    return TextField(name, value, store)
+
+def parse_level(level):
+    """Leading integer of a level like '4' or '8+', None if there is none"""
+    match = re.match(r'\s*(\d+)', level or '')
+    if not match:
+        return None
+    return int(match.group(1))
+
+def level_bucket(level):
+    """Difficulty bucket name (easy/intermediate/hard) of a level like '4' or '8+'"""
+    level_int = parse_level(level)
+    if level_int is None:
+        return None
+    for bucket, (min_level, max_level) in DIFFICULTY_RANGES.items():
+        if min_level <= level_int <= max_level:
+            return bucket
+    return None
+
+def doc_key(row):
+    """Unique key of a row: the url, or the Wikipedia title for Wikipedia-only rows"""
+    if row.get('url'):
+        return row['url']
+    return 'wiki:' + (row.get('wiki_title') or '')
+
+def group_key(row):
+    """Collection of a row for grouped search: composer + group_name, or the row itself if it has none"""
+    if row.get('group_name'):
+        return f"{row.get('composer') or ''}{GROUP_SEPARATOR}{row['group_name']}"
+    return doc_key(row)
+
+def content_hash(row, term_vectors=False, encoder=None):
+    """Stable hash over all CSV columns of a row
+    
+    Documents with term vectors or a document vector hash differently, so
+    switching either on or off (or refitting the vector model) rewrites
+    every document on the next incremental run, as does a new SCHEMA_VERSION.
+    """
+    content = '\x1f'.join(f"{column}={row[column] or ''}" for column in sorted(row) if column)
+    content += f'\x1fschema={SCHEMA_VERSION}'
+    if term_vectors:
+        content += '\x1fterm_vectors'
+    if encoder is not None:
+        content += f'\x1fvectors={encoder.model_id}'
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+def build_document(row, term_vectors=False, encoder=None):
+    """Build a Lucene Document from one CSV row
+    
+    With term_vectors the SIMILAR_FIELDS keep per-document term vectors.
+    With encoder (a VectorModel) the row's document vector is indexed for k-NN.
+    """
+    doc = Document()
+    
+    # Unique key + content hash (exact match + stored) for incremental updates
+    doc.add(StringField('doc_id', doc_key(row), Field.Store.YES))
+    doc.add(StoredField('content_hash', content_hash(row, term_vectors, encoder)))
+    
+    # TextField = tokenized, full-text searchable
+    # Name (searchable + stored)
+    if row.get('name') and row['name'].strip():
+        doc.add(text_field('name', row['name'], Field.Store.YES, term_vectors))
+    
+    # Composer (searchable + stored)
+    if row.get('composer') and row['composer'].strip():
+        doc.add(text_field('composer', row['composer'], Field.Store.YES, term_vectors))
+    
+    # Description (searchable, not stored - saves space)
+    if row.get('description'):
+        doc.add(text_field('description', row['description'], Field.Store.NO, term_vectors))
+    
+    # Summary (searchable, not stored)
+    if row.get('summary'):
+        doc.add(text_field('summary', row['summary'], Field.Store.NO, term_vectors))
+    
+    # Wikipedia paragraph (searchable, not stored)
+    if row.get('wiki_paragraph'):
+        doc.add(text_field('wiki_paragraph', row['wiki_paragraph'], Field.Store.NO, term_vectors))
+    
+    # Genre from Wikipedia infobox (searchable + stored)
+    if row.get('info_genre'):
+        doc.add(text_field('info_genre', row['info_genre'], Field.Store.YES, term_vectors))
+    
+    # Form from Wikipedia infobox (searchable + stored)
+    if row.get('info_form'):
+        doc.add(text_field('info_form', row['info_form'], Field.Store.YES, term_vectors))
+    
+    # Movements from Wikipedia infobox (searchable, not stored)
+    if row.get('info_movements'):
+        doc.add(text_field('info_movements', row['info_movements'], Field.Store.NO, term_vectors))
+    
+    # StringField = exact match only, not tokenized
+    # Key (exact match + stored)
+    if row.get('key'):
+        doc.add(StringField('key', row['key'], Field.Store.YES))
+    
+    # Year - indexed for range queries + stored as string
+    if row.get('year') and row['year'].strip():
+        try:
+            year_int = int(row['year'])
+            # IntPoint for range queries
+            doc.add(IntPoint('year_range', year_int))
+            # NumericDocValuesField for sorting
+            doc.add(NumericDocValuesField('year_sort', year_int))
+            # StringField for display
+            doc.add(StringField('year', row['year'], Field.Store.YES))
+        except ValueError:
+            # If year is not a valid integer, just store as string
+            doc.add(StringField('year', row['year'], Field.Store.YES))
+    
+    # Level - indexed for range queries (difficulty) + stored as string
+    if row.get('level') and row['level'].strip():
+        # Same value as the difficulty facet, so '8+' is filtered and counted as hard alike
+        level_int = parse_level(row['level'])
+        if level_int is not None:
+            # IntPoint for range queries (difficulty filtering)
+            doc.add(IntPoint('level_range', level_int))
+            # NumericDocValuesField for sorting
+            doc.add(NumericDocValuesField('level_sort', level_int))
+        # StringField for display
+        doc.add(StringField('level', row['level'], Field.Store.YES))
+    
+    # Period (exact match + stored)
+    if row.get('period'):
+        doc.add(StringField('period', row['period'], Field.Store.YES))
+    
+    # Catalogue from Wikipedia (exact match + stored)
+    if row.get('info_catalogue'):
+        doc.add(StringField('info_catalogue', row['info_catalogue'], Field.Store.YES))
+    
+    # Opus from Wikipedia (exact match + stored)
+    if row.get('info_opus'):
+        doc.add(StringField('info_opus', row['info_opus'], Field.Store.YES))
+    
+    # Normalized catalogue numbers (exact match, multi-valued) for the catalogue fast path
+    ids = catalogue_ids(row.get('name')) + catalogue_ids(row.get('info_catalogue')) + opus_ids(row.get('info_opus'))
+    for catalogue_id in dict.fromkeys(ids):
+        doc.add(StringField(CATALOGUE_FIELD, catalogue_id, Field.Store.NO))
+    
+    # Composed year from Wikipedia (exact match + stored)
+    if row.get('info_composed'):
+        doc.add(StringField('info_composed', row['info_composed'], Field.Store.YES))
+    
+    # StoredField = only stored, not searchable
+    # URL (stored only)
+    if row.get('url'):
+        doc.add(StoredField('url', row['url']))
+    
+    # Wikipedia title (searchable + stored)
+    if row.get('wiki_title'):
+        doc.add(text_field('wiki_title', row['wiki_title'], Field.Store.YES, term_vectors))
+    
+    # Wikipedia composer (searchable + stored)
+    if row.get('wiki_composer'):
+        doc.add(text_field('wiki_composer', row['wiki_composer'], Field.Store.YES, term_vectors))
+    
+    # Related downloads - searchable
+    if row.get('related_downloads'):
+        doc.add(text_field('related', row['related_downloads'], Field.Store.NO, term_vectors))
+    
+    # Collection (stored) + its sorted doc values key for grouped search
+    if row.get('group_name'):
+        doc.add(StoredField('group_name', row['group_name']))
+    doc.add(SortedDocValuesField(GROUP_FIELDS['collection'], BytesRef(group_key(row))))
+    
+    # Document vector (HNSW graph) for k-NN and hybrid search
+    if encoder is not None:
+        vector = encoder.encode_row(row)
+        if vector is not None:
+            doc.add(KnnFloatVectorField(KNN_FIELD, JArray('float')(vector.tolist()), VectorSimilarityFunction.COSINE))
+    
+    # Facets (sorted set doc values) - counted per query without loading hits
+    for dim in FACET_DIMS:
+        value = level_bucket(row.get('level')) if dim == 'difficulty' else (row.get(dim) or '').strip()
+        if value:
+            doc.add(SortedSetDocValuesFacetField(dim, value))
+    
+    return doc
+
+def read_chunks(f, chunk_size):
+    """Stream CSV rows in lists of at most chunk_size rows"""
+    reader = csv.DictReader(f)
+    while True:
+        chunk = list(islice(reader, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def load_hashes(store):
+    """Read doc_id -> content hash for all live documents of an existing index
+    
+    Returns None if the index has documents without a doc_id (built before
+    incremental indexing existed), so the caller can fall back to a full build.
+    """
+    hashes = {}
+    if not DirectoryReader.indexExists(store):
+        return hashes
+    
+    reader = DirectoryReader.open(store)
+    try:
+        fields = HashSet()
+        fields.add('doc_id')
+        fields.add('content_hash')
+        stored = reader.storedFields()
+        live_docs = MultiBits.getLiveDocs(reader)
+        for doc_id in range(reader.maxDoc()):
+            if live_docs is not None and not live_docs.get(doc_id):
+                continue
+            doc = stored.document(doc_id, fields)
+            if doc.get('doc_id') is None:
+                return None
+            hashes[doc.get('doc_id')] = doc.get('content_hash')
+    finally:
+        reader.close()
+    
+    return hashes
+
+def index_chunk(writer, chunk, facets_config, existing=None, term_vectors=False, encoder=None):
+    """Build and add documents for one chunk, returns row counts per action
+    
+    facets_config turns the facet fields into doc values. With existing
+    (doc_id -> content hash of the current index) only added and changed
+    rows are written, and every key seen is popped from existing.
+    """
+    counts = Counter()
+    for row in chunk:
+        if existing is None:
+            writer.addDocument(facets_config.build(build_document(row, term_vectors, encoder)))
+            counts['added'] += 1
+            continue
+        
+        key = doc_key(row)
+        old_hash = existing.pop(key, None)
+        if old_hash == content_hash(row, term_vectors, encoder):
+            counts['unchanged'] += 1
+            continue
+        writer.updateDocument(Term('doc_id', key), facets_config.build(build_document(row, term_vectors, encoder)))
+        counts['added' if old_hash is None else 'updated'] += 1
+    return counts
+
+def shard_of(row, shards, shard_by):
+    """Shard number of a row: stable hash of its key (shard_by='url') or of its period"""
+    if shards == 1:
+        return 0
+    value = doc_key(row) if shard_by == 'url' else (row.get('period') or '').strip()
+    return zlib.crc32(value.encode('utf-8')) % shards
+
+def segments_sorted(path, index_sort):
+    """Whether every segment of the index in path is sorted by index_sort (None = unsorted)"""
+    store = FSDirectory.open(Paths.get(path))
+    if not DirectoryReader.indexExists(store):
+        return True
+    for info in SegmentInfos.readLatestCommit(store):
+        segment_sort = SegmentCommitInfo.cast_(info).info.getIndexSort()
+        if index_sort is None:
+            if segment_sort is not None:
+                return False
+        elif not index_sort.equals(segment_sort):
+            return False
+    return True
+
+def open_writer(path, incremental, ram_buffer_mb, merge_policy, index_sort=None):
+    """IndexWriter for one index directory
+    
+    With index_sort (a Lucene Sort) segments are stored in that order.
+    """
+    config = IndexWriterConfig(StandardAnalyzer())
+    if incremental:
+        config.setOpenMode(IndexWriterConfig.OpenMode.CREATE_OR_APPEND)
+    else:
+        config.setOpenMode(IndexWriterConfig.OpenMode.CREATE)
+    config.setRAMBufferSizeMB(float(ram_buffer_mb))
+    config.setMergePolicy(MERGE_POLICIES[merge_policy]())
+    if index_sort is not None:
+        config.setIndexSort(index_sort)
+    return IndexWriter(FSDirectory.open(Paths.get(path)), config)
+
+def write_shard_manifest(index_dir, shards, shard_by):
+    """Record the shard layout for MusicSearcher, or remove it for a single-directory index"""
+    manifest_path = os.path.join(index_dir, SHARD_MANIFEST)
+    if shards == 1:
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        return
+    manifest = {
+        'shards': shards,
+        'by': shard_by,
+        'dirs': [f"shard_{shard:02d}" for shard in range(shards)]
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+def read_shard_manifest(index_dir):
+    """(shards, shard_by) of the existing index, (1, 'url') for a single-directory index"""
+    manifest_path = os.path.join(index_dir, SHARD_MANIFEST)
+    if not os.path.exists(manifest_path):
+        return 1, 'url'
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    return manifest['shards'], manifest['by']
+
+def create_index(csv_path, index_dir, threads=1, ram_buffer_mb=64.0, merge_policy='tiered', chunk_size=500,
+                 incremental=False, suggest=True, shards=1, shard_by='url', only_shards=None, term_vectors=False,
+                 vectors=False, vector_dims=128, index_sort=False):
+    """Create Lucene index from music CSV
+    
+    Rows are streamed in chunks of chunk_size. With threads > 1 the chunks are
+    turned into documents on a pool of JVM-attached worker threads that share
+    one IndexWriter (IndexWriter is thread-safe and analyzes concurrently).
+    
+    With incremental=True the existing index is kept and only rows that were
+    added, changed (by content hash) or removed since the last run are written.
+    
+    With shards > 1 the index is split into shard_00 ... subdirectories by
+    hash of the row key (shard_by='url') or of its period (shard_by='period'),
+    each with its own IndexWriter and a share of the RAM buffer. only_shards
+    (shard numbers) rebuilds just those shards of an existing sharded index.
+    
+    With term_vectors=True the SIMILAR_FIELDS store term vectors, which
+    MusicSearcher.similar() reads instead of re-analyzing stored text (the
+    long text fields are not stored, so without vectors they are ignored).
+    
+    With vectors=True a TF-IDF/LSA model of vector_dims dimensions (see
+    vectors.py) is fitted on the CSV, or reused when updating incrementally,
+    and every document gets its vector in an HNSW-indexed KNN_FIELD.
+    
+    With index_sort=True every segment is stored in INDEX_SORT order (year,
+    then level), so searches in that order and filter-only queries can stop
+    collecting early (see MusicSearcher).
+    
+    With suggest=True the type-ahead suggester (see suggest.py) is built next
+    to the index, incrementally when the index is.
+    """
     # Initialize VM if not already running
     if not lucene.getVMEnv():
         lucene.initVM()
+    env = lucene.getVMEnv()
+    
+    if os.path.islink(os.path.join(index_dir, CURRENT_LINK)):
+        # Searchers follow the link, an index written next to it would never be served
+        raise ValueError(f"{index_dir} holds versioned indexes, build with 'python rebuild.py --index {index_dir} build'")
+    if shard_by not in ('url', 'period'):
+        raise ValueError("shard_by must be 'url' or 'period'")
+    if shards == 1:
+        shard_by = 'url'
+    if only_shards is not None:
+        if (shards, shard_by) != read_shard_manifest(index_dir) or shards == 1:
+            raise ValueError(f"only_shards needs an existing index with {shards} shards by {shard_by}")
+        if not set(only_shards) <= set(range(shards)):
+            raise ValueError(f"shard numbers must be between 0 and {shards - 1}")
+    elif incremental and (shards, shard_by) != read_shard_manifest(index_dir):
+        print("Shard layout changed, rebuilding fully...")
+        incremental = False
+    
+    # One target directory per shard, the index directory itself when unsharded
+    if shards == 1:
+        paths = {0: index_dir}
+    else:
+        paths = {shard: os.path.join(index_dir, f"shard_{shard:02d}") for shard in range(shards)}
+    if only_shards is not None:
+        paths = {shard: paths[shard] for shard in only_shards}
+    
+    # A writer cannot change the sort of existing segments
+    lucene_sort = build_sort(INDEX_SORT, tiebreak=False) if index_sort else None
+    if incremental and not all(segments_sorted(path, lucene_sort) for path in paths.values()):
+        print("Index sort changed, rebuilding fully...")
+        incremental = False
+    
+    existing = {}
+    if incremental:
+        for shard, path in paths.items():
+            existing[shard] = load_hashes(FSDirectory.open(Paths.get(path)))
+        if any(hashes is None for hashes in existing.values()):
+            print("Existing index has no doc_id keys, rebuilding fully...")
+            incremental = False
+    if not incremental:
+        existing = {shard: None for shard in paths}
+    
+    # The existing model is kept for incremental runs so old and new vectors stay comparable
+    encoder = None
+    if vectors:
+        if (incremental or only_shards is not None) and os.path.exists(model_path(index_dir)):
+            encoder = VectorModel.load(model_path(index_dir))
+        else:
+            print(f"Fitting {vector_dims}-dimensional document vectors...")
+            with open(csv_path, 'r', encoding='utf-8') as f:
+                encoder = VectorModel.fit(islice(csv.DictReader(f), MAX_FIT_ROWS), dims=vector_dims)
+    
+    writers = {shard: open_writer(path, incremental, ram_buffer_mb / len(paths), merge_policy, lucene_sort)
+               for shard, path in paths.items()}
+    facets_config = FacetsConfig()
+    
+    mode = "incrementally" if incremental else "fully"
+    layout = f", {len(paths)} of {shards} shards by {shard_by}" if shards > 1 else ""
+    print(f"Indexing {csv_path} {mode} ({threads} thread(s), {ram_buffer_mb} MB RAM buffer, "
+          f"{merge_policy} merges{layout}{', sorted by ' + INDEX_SORT if index_sort else ''})...")
+    counts = Counter()
+    start = time.perf_counter()
+    
+    def shard_chunks(chunk):
+        """Split a chunk into (shard, rows) work units for the shards being written"""
+        groups = {}
+        for row in chunk:
+            shard = shard_of(row, shards, shard_by)
+            if shard in writers:
+                groups.setdefault(shard, []).append(row)
+        return groups.items()
+    
+    try:
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            if threads <= 1:
+                for chunk in read_chunks(f, chunk_size):
+                    for shard, rows in shard_chunks(chunk):
+                        counts += index_chunk(writers[shard], rows, facets_config, existing[shard], term_vectors,
+                                              encoder)
+            else:
+                with ThreadPoolExecutor(max_workers=threads, initializer=env.attachCurrentThread) as pool:
+                    # Keep a bounded number of chunks in flight so memory stays flat
+                    pending = set()
+                    for chunk in read_chunks(f, chunk_size):
+                        for shard, rows in shard_chunks(chunk):
+                            pending.add(pool.submit(index_chunk, writers[shard], rows, facets_config, existing[shard],
+                                                    term_vectors, encoder))
+                        if len(pending) >= threads * 2:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                counts += future.result()
+                    for future in pending:
+                        counts += future.result()
+        
+        # Keys left in existing were not in the CSV (or not in that shard) anymore
+        for shard, hashes in existing.items():
+            if hashes:
+                for key in hashes:
+                    writers[shard].deleteDocuments(Term('doc_id', key))
+                counts['deleted'] += len(hashes)
+        
+        for writer in writers.values():
+            writer.commit()
+    except BaseException:
+        # close() would commit the partial build over the previous index, rollback() keeps the last commit
+        for writer in writers.values():
+            writer.rollback()
+        raise
+    for writer in writers.values():
+        writer.close()
+    
+    write_shard_manifest(index_dir, shards, shard_by)
+    if encoder is not None:
+        encoder.save(model_path(index_dir))
+    elif only_shards is None and os.path.exists(model_path(index_dir)):
+        # The documents have no vectors anymore
+        os.remove(model_path(index_dir))
+    
+    # Throughput covers the documents only, the suggester is timed on its own
+    count = counts['added'] + counts['updated'] + counts['unchanged']
+    elapsed = time.perf_counter() - start
+    docs_per_sec = count / elapsed if elapsed > 0 else 0.0
+    
+    # Suggestions are aggregated per text over the whole corpus, in one more pass
+    suggestions = 0
+    suggest_seconds = 0.0
+    if suggest:
+        suggest_start = time.perf_counter()
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            entries = collect_suggestions(csv.DictReader(f), level_bucket)
+        suggestions = build_suggester(index_dir, entries, incremental=incremental or only_shards is not None)
+        suggest_seconds = time.perf_counter() - suggest_start
+    
+    print(f"✅ Indexed {count} music pieces to {index_dir} in {elapsed:.1f}s ({docs_per_sec:.0f} docs/sec)")
+    if incremental:
+        print(f"   added: {counts['added']}, updated: {counts['updated']}, "
+              f"deleted: {counts['deleted']}, unchanged: {counts['unchanged']}")
+    if suggest:
+        print(f"   suggestions written: {suggestions} in {suggest_seconds:.1f}s")
     
-    # Create index directory
-    store = FSDirectory.open(Paths.get(index_dir))
-    analyzer = StandardAnalyzer()
-    config = IndexWriterConfig(analyzer)
-    config.setOpenMode(IndexWriterConfig.OpenMode.CREATE)
-    writer = IndexWriter(store, config)
-    
-    print(f"Indexing {csv_path}...")
-    count = 0
-    
-    with open(csv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            doc = Document()
-            
-            # TextField = tokenized, full-text searchable
-            # Name (searchable + stored)
-            if row.get('name') and row['name'].strip():
-                doc.add(TextField('name', row['name'], Field.Store.YES))
-            
-            # Composer (searchable + stored)
-            if row.get('composer') and row['composer'].strip():
-                doc.add(TextField('composer', row['composer'], Field.Store.YES))
-            
-            # Description (searchable, not stored - saves space)
-            if row.get('description'):
-                doc.add(TextField('description', row['description'], Field.Store.NO))
-            
-            # Summary (searchable, not stored)
-            if row.get('summary'):
-                doc.add(TextField('summary', row['summary'], Field.Store.NO))
-            
-            # Wikipedia paragraph (searchable, not stored)
-            if row.get('wiki_paragraph'):
-                doc.add(TextField('wiki_paragraph', row['wiki_paragraph'], Field.Store.NO))
-            
-            # Genre from Wikipedia infobox (searchable + stored)
-            if row.get('info_genre'):
-                doc.add(TextField('info_genre', row['info_genre'], Field.Store.YES))
-            
-            # Form from Wikipedia infobox (searchable + stored)
-            if row.get('info_form'):
-                doc.add(TextField('info_form', row['info_form'], Field.Store.YES))
-            
-            # Movements from Wikipedia infobox (searchable, not stored)
-            if row.get('info_movements'):
-                doc.add(TextField('info_movements', row['info_movements'], Field.Store.NO))
-            
-            # StringField = exact match only, not tokenized
-            # Key (exact match + stored)
-            if row.get('key'):
-                doc.add(StringField('key', row['key'], Field.Store.YES))
-            
-            # Year - indexed for range queries + stored as string
-            if row.get('year') and row['year'].strip():
-                try:
-                    year_int = int(row['year'])
-                    # IntPoint for range queries
-                    doc.add(IntPoint('year_range', year_int))
-                    # NumericDocValuesField for sorting
-                    doc.add(NumericDocValuesField('year_sort', year_int))
-                    # StringField for display
-                    doc.add(StringField('year', row['year'], Field.Store.YES))
-                except ValueError:
-                    # If year is not a valid integer, just store as string
-                    doc.add(StringField('year', row['year'], Field.Store.YES))
-            
-            # Level - indexed for range queries (difficulty) + stored as string
-            if row.get('level') and row['level'].strip():
-                try:
-                    level_int = int(row['level'])
-                    # IntPoint for range queries (difficulty filtering)
-                    doc.add(IntPoint('level_range', level_int))
-                    # NumericDocValuesField for sorting
-                    doc.add(NumericDocValuesField('level_sort', level_int))
-                    # StringField for display
-                    doc.add(StringField('level', row['level'], Field.Store.YES))
-                except ValueError:
-                    # If level is not a valid integer, just store as string
-                    doc.add(StringField('level', row['level'], Field.Store.YES))
-            
-            # Period (exact match + stored)
-            if row.get('period'):
-                doc.add(StringField('period', row['period'], Field.Store.YES))
-            
-            # Catalogue from Wikipedia (exact match + stored)
-            if row.get('info_catalogue'):
-                doc.add(StringField('info_catalogue', row['info_catalogue'], Field.Store.YES))
-            
-            # Opus from Wikipedia (exact match + stored)
-            if row.get('info_opus'):
-                doc.add(StringField('info_opus', row['info_opus'], Field.Store.YES))
-            
-            # Composed year from Wikipedia (exact match + stored)
-            if row.get('info_composed'):
-                doc.add(StringField('info_composed', row['info_composed'], Field.Store.YES))
-            
-            # StoredField = only stored, not searchable
-            # URL (stored only)
-            if row.get('url'):
-                doc.add(StoredField('url', row['url']))
-            
-            # Wikipedia title (searchable + stored)
-            if row.get('wiki_title'):
-                doc.add(TextField('wiki_title', row['wiki_title'], Field.Store.YES))
-            
-            # Wikipedia composer (searchable + stored)
-            if row.get('wiki_composer'):
-                doc.add(TextField('wiki_composer', row['wiki_composer'], Field.Store.YES))
-            
-            # Related downloads - searchable
-            if row.get('related_downloads'):
-                doc.add(TextField('related', row['related_downloads'], Field.Store.NO))
-            
-            writer.addDocument(doc)
-            count += 1
-            
-            if count % 100 == 0:
-                print(f"  Indexed {count} documents...")
-    
-    writer.commit()
-    writer.close()
-    
-    print(f"✅ Indexed {count} music pieces to {index_dir}")
+    return {
+        'documents': count,
+        'seconds': elapsed,
+        'docs_per_sec': docs_per_sec,
+        'suggest_seconds': suggest_seconds,
+        'shards': shards,
+        'added': counts['added'],
+        'updated': counts['updated'],
+        'deleted': counts['deleted'],
+        'unchanged': counts['unchanged'],
+        'suggestions': suggestions
+    }
 
 if __name__ == "__main__":
-    csv_path = "/data/music_enriched.csv"
-    index_dir = "/data/music_index"
+    parser = argparse.ArgumentParser(description="Index music_enriched.csv with PyLucene")
+    parser.add_argument('--csv', default="/data/music_enriched.csv")
+    parser.add_argument('--index', default="/data/music_index")
+    parser.add_argument('--threads', type=int, default=1, help="worker threads building documents")
+    parser.add_argument('--ram-buffer-mb', type=float, default=64.0, help="IndexWriter RAM buffer size")
+    parser.add_argument('--merge-policy', choices=sorted(MERGE_POLICIES), default='tiered')
+    parser.add_argument('--chunk-size', type=int, default=500, help="CSV rows per work unit")
+    parser.add_argument('--incremental', action='store_true', help="only write rows added, changed or removed since the last run")
+    parser.add_argument('--shards', type=int, default=1, help="split the index into this many shard directories")
+    parser.add_argument('--shard-by', choices=['url', 'period'], default='url', help="what rows are hashed on to pick a shard")
+    parser.add_argument('--only-shards', default=None, help="comma-separated shard numbers to rebuild, e.g. 0,3")
+    parser.add_argument('--term-vectors', action='store_true', help="store term vectors for similar-piece queries")
+    parser.add_argument('--vectors', action='store_true', help="index TF-IDF/LSA document vectors for semantic search")
+    parser.add_argument('--vector-dims', type=int, default=128)
+    parser.add_argument('--index-sort', action='store_true', help="store documents sorted by year, then level")
+    parser.add_argument('--no-suggest', action='store_true', help="skip building the type-ahead suggester")
+    args = parser.parse_args()
     
-    create_index(csv_path, index_dir)
\ No newline at end of file
+    create_index(args.csv, args.index, threads=args.threads, ram_buffer_mb=args.ram_buffer_mb,
+                 merge_policy=args.merge_policy, chunk_size=args.chunk_size, incremental=args.incremental,
+                 suggest=not args.no_suggest, term_vectors=args.term_vectors, vectors=args.vectors,
+                 vector_dims=args.vector_dims, shards=args.shards, shard_by=args.shard_by, index_sort=args.index_sort,
+                 only_shards=[int(shard) for shard in args.only_shards.split(',')] if args.only_shards else None)
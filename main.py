@@ -2,9 +2,59 @@
 PyLucene Music Search - Main Menu
 Single container for indexing and searching
 """
-import lucene
 import os
-import sys
+import time
+
+INDEX_DIR = "/data/music_index"
+CSV_PATH = "/data/music_enriched.csv"
+QUERIES_FILE = "/data/queries.json"
+# Queries run before the first search prompt (queries.json or one query per line, empty to skip)
+WARMUP_QUERIES = os.environ.get("MUSIC_WARMUP_QUERIES", QUERIES_FILE)
+# Shards of a newly built index (1 = single directory)
+SHARDS = int(os.environ.get("MUSIC_SHARDS", "1"))
+# Store term vectors for faster, more accurate "similar pieces" (set to 1, makes the index larger)
+TERM_VECTORS = os.environ.get("MUSIC_TERM_VECTORS", "0") == "1"
+# Index TF-IDF/LSA document vectors for semantic and hybrid search (set to 1, fitting adds ~20 s per full build)
+VECTORS = os.environ.get("MUSIC_VECTORS", "0") == "1"
+# Store documents sorted by year, then level, so year-ordered and filter-only searches stop early
+# (equal-score hits then come oldest first instead of in CSV order)
+INDEX_SORT = os.environ.get("MUSIC_INDEX_SORT", "0") == "1"
+# Rotating JSONL log of profiled searches (unset to disable)
+QUERY_LOG = os.environ.get("MUSIC_QUERY_LOG")
+
+class Session:
+    """One JVM and one searcher shared by all menu actions, both started on first use"""
+    
+    def __init__(self):
+        self.vm_ms = None
+        self.searcher = None
+    
+    def start_vm(self):
+        if self.vm_ms is not None:
+            return
+        start = time.perf_counter()
+        # Deferred: loading the JCC extension and starting the JVM is the slow part of startup
+        import lucene
+        if not lucene.getVMEnv():
+            lucene.initVM()
+        self.vm_ms = (time.perf_counter() - start) * 1000.0
+    
+    def get_searcher(self):
+        if self.searcher is None:
+            self.start_vm()
+            from searcher import open_searcher
+            self.searcher, timings = open_searcher(INDEX_DIR, WARMUP_QUERIES, refresh_interval=5.0,
+                                                   query_log=QUERY_LOG)
+            first_result_ms = self.vm_ms + timings['open_ms'] + timings['first_query_ms']
+            print(f"Startup: JVM {self.vm_ms:.0f} ms, index open {timings['open_ms']:.0f} ms, "
+                  f"warm-up {timings['warmup_queries']} queries {timings['warmup_ms']:.0f} ms, "
+                  f"time to first result {first_result_ms:.0f} ms")
+        return self.searcher
+    
+    def close(self):
+        if self.searcher is not None:
+            self.searcher.close()
+            self.searcher = None
 
 def show_menu():
     print("\n" + "=" * 60)
@@ -16,32 +66,52 @@ def show_menu():
     print("4. Exit")
     print("=" * 60)
 
-def run_indexer():
+def run_indexer(session):
     print("\n" + "=" * 60)
     print("INDEXING MUSIC DATA")
     print("=" * 60)
     
     # Check if CSV exists
-    csv_path = "/data/music_enriched.csv"
+    csv_path = CSV_PATH
     if not os.path.exists(csv_path):
         print(f"ERROR: {csv_path} not found!")
         print("Make sure to mount music_enriched.csv to /data/")
         return
     
-    from indexer import create_index
-    index_dir = "/data/music_index"
-    create_index(csv_path, index_dir)
+    session.start_vm()
+    from indexer import read_shard_manifest
+    from rebuild import rebuild
+    from searcher import resolve_index_dir
+    index_dir = INDEX_DIR
+    
+    # Existing index: only apply what changed in the CSV since the last run
+    incremental = False
+    shards, shard_by = SHARDS, 'url'
+    if os.path.exists(index_dir) and os.listdir(index_dir):
+        answer = input("Index exists. Update incrementally? [Y/n]: ").strip().lower()
+        incremental = answer in ('', 'y', 'yes')
+        if incremental:
+            # Keep the shard layout of the existing index
+            shards, shard_by = read_shard_manifest(resolve_index_dir(index_dir))
+    
+    # Built as a new version next to the live one, promoted only if it validates
+    rebuild(csv_path, index_dir, WARMUP_QUERIES, incremental=incremental, shards=shards, shard_by=shard_by,
+            term_vectors=TERM_VECTORS, vectors=VECTORS, index_sort=INDEX_SORT)
+    
+    # An open searcher switches to the new version without reopening
+    if session.searcher is not None:
+        session.searcher.maybe_refresh()
     
     print("\nIndexing complete! Press Enter to continue...")
     input()
 
-def run_search():
+def run_search(session):
     print("\n" + "=" * 60)
     print("INTERACTIVE SEARCH")
     print("=" * 60)
     
     # Check if index exists
-    index_path = "/data/music_index"
+    index_path = INDEX_DIR
     if not os.path.exists(index_path) or not os.listdir(index_path):
         print(f"ERROR: No index found at {index_path}")
         print("Please run 'Index music data' first (option 1)")
@@ -49,20 +119,20 @@ def run_search():
         input()
         return
     
+    searcher = session.get_searcher()
     from search_cli import main as search_main
     print("\nType your search queries. Use 'back' to return to menu, 'quit' to exit.\n")
-    search_main()
+    search_main(searcher)
 
-def run_metrics():
-    metrics_path = os.path.join(os.path.dirname(__file__), "test_metrics.py")
-    # Use the same Python interpreter
-    exit_code = os.system(f"{sys.executable} {metrics_path}")
-    if exit_code != 0:
-        print("Error running metrics evaluation.")
+def run_metrics(session):
+    # Runs in this process on the session's JVM, but on its own searcher without a
+    # result cache: the session searcher would time cache hits from the second run on
+    session.start_vm()
+    from test_metrics import evaluate_searcher
+    evaluate_searcher(INDEX_DIR, QUERIES_FILE)
 
 def main():
-    # Initialize JVM once
-    lucene.initVM()
+    session = Session()
     
     while True:
         show_menu()
@@ -71,13 +141,14 @@ def main():
             choice = input("\nSelect option (1-4): ").strip()
             
             if choice == "1":
-                run_indexer()
+                run_indexer(session)
             elif choice == "2":
-                run_search()
+                run_search(session)
             elif choice == "3":
-                run_metrics()
+                run_metrics(session)
             elif choice == "4":
                 print("\nGoodbye!")
+                session.close()
                 break
             else:
                 print("\nInvalid choice. Please select 1, 2, 3, or 4.")
@@ -0,0 +1,190 @@
+"""
+Zero-downtime index rebuilds for PyLucene Music Search Engine
+Builds each index version in its own directory, validates it and atomically repoints
+<index>/current at it; MusicSearcher follows the link on refresh
+"""
+import lucene
+import argparse
+import os
+import shutil
+import time
+from indexer import create_index
+from searcher import MusicSearcher, CURRENT_LINK, SHARD_MANIFEST, load_warmup_queries
+
+VERSIONS_DIR = 'versions'
+
+def versions_path(root):
+    return os.path.join(root, VERSIONS_DIR)
+
+def list_versions(root):
+    """Version names under root/versions, oldest first"""
+    path = versions_path(root)
+    if not os.path.isdir(path):
+        return []
+    return sorted(name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)))
+
+def current_version(root):
+    """Name of the version root/current points at, None before the first promotion"""
+    link = os.path.join(root, CURRENT_LINK)
+    if not os.path.islink(link):
+        return None
+    return os.path.basename(os.readlink(link))
+
+def promote(root, version):
+    """Atomically point root/current at a version (rename of a fresh symlink over the old one)"""
+    if version not in list_versions(root):
+        raise ValueError(f"unknown index version {version}")
+    tmp_link = os.path.join(root, CURRENT_LINK + '.tmp')
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    # Relative target, so the index directory can be mounted elsewhere
+    os.symlink(os.path.join(VERSIONS_DIR, version), tmp_link)
+    os.replace(tmp_link, os.path.join(root, CURRENT_LINK))
+
+def prune(root, keep):
+    """Delete all but the newest keep versions, never the current one; returns the deleted names"""
+    current = current_version(root)
+    versions = list_versions(root)
+    deleted = [version for version in versions[:max(0, len(versions) - keep)] if version != current]
+    for version in deleted:
+        shutil.rmtree(os.path.join(versions_path(root), version))
+    return deleted
+
+def has_index(path):
+    """Whether path directly holds a (plain or sharded) index"""
+    if not os.path.isdir(path):
+        return False
+    return any(name.startswith('segments_') or name == SHARD_MANIFEST for name in os.listdir(path))
+
+def count_docs(index_dir):
+    searcher = MusicSearcher(index_dir, cache_size=0)
+    try:
+        with searcher.acquire() as index_searcher:
+            return index_searcher.getIndexReader().numDocs()
+    finally:
+        searcher.close()
+
+def validate(index_dir, expected_docs, smoke_queries, live_docs=None, max_shrink=0.1):
+    """Problems found in a built version, an empty list if it may go live
+
+    The version must hold expected_docs documents, have at most max_shrink
+    fewer documents than the live version, and return hits for every smoke query.
+    """
+    problems = []
+    searcher = MusicSearcher(index_dir, cache_size=0)
+    try:
+        with searcher.acquire() as index_searcher:
+            num_docs = index_searcher.getIndexReader().numDocs()
+        if num_docs != expected_docs:
+            problems.append(f"index holds {num_docs} documents, expected {expected_docs}")
+        if live_docs and num_docs < live_docs * (1.0 - max_shrink):
+            problems.append(f"index shrank from {live_docs} to {num_docs} documents")
+        for query in smoke_queries:
+            if not searcher.multi_field_search(query, max_results=1, fields='id'):
+                problems.append(f"no results for smoke query '{query}'")
+    finally:
+        searcher.close()
+    return problems
+
+def rebuild(csv_path, root, smoke_file=None, keep=3, incremental=False, **index_options):
+    """Build a new version of the index under root, validate it and promote it
+
+    incremental=True starts from a copy of the current version and applies
+    only the CSV changes. A version that fails validation is deleted and
+    the current one stays live. Returns the new version name, None on failure.
+    index_options go to create_index.
+    """
+    if not lucene.getVMEnv():
+        lucene.initVM()
+    version = time.strftime('%Y%m%d-%H%M%S')
+    version_dir = os.path.join(versions_path(root), version)
+    if os.path.exists(version_dir):
+        raise ValueError(f"index version {version} already exists")
+
+    current = current_version(root)
+    live_dir = os.path.join(versions_path(root), current) if current else None
+    if live_dir is None and has_index(root):
+        # An index written into root before versioning was introduced
+        live_dir = root
+    live_docs = count_docs(live_dir) if live_dir else None
+
+    if incremental and current:
+        # No writer touches the live version, so a file copy is a consistent snapshot
+        shutil.copytree(live_dir, version_dir)
+    else:
+        incremental = False
+        os.makedirs(version_dir)
+
+    print(f"Building index version {version}...")
+    try:
+        stats = create_index(csv_path, version_dir, incremental=incremental, **index_options)
+        problems = validate(version_dir, stats['documents'], load_warmup_queries(smoke_file), live_docs)
+    except BaseException:
+        # A failed build must not linger as a version rollback() could promote
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+    if problems:
+        print(f"❌ Version {version} failed validation, {current or 'the old index'} stays live:")
+        for problem in problems:
+            print(f"   {problem}")
+        shutil.rmtree(version_dir)
+        return None
+
+    promote(root, version)
+    deleted = prune(root, keep)
+    print(f"✅ Index version {version} is live ({stats['documents']} documents)")
+    if deleted:
+        print(f"   removed old versions: {', '.join(deleted)}")
+    return version
+
+def rollback(root, version=None):
+    """Promote version, or the one before the current version; returns the promoted name"""
+    versions = list_versions(root)
+    current = current_version(root)
+    if version is None:
+        older = [name for name in versions if current is None or name < current]
+        if not older:
+            raise ValueError("no older index version to roll back to")
+        version = older[-1]
+    promote(root, version)
+    print(f"✅ Rolled back to index version {version}")
+    return version
+
+def main():
+    parser = argparse.ArgumentParser(description="Build, validate and promote index versions without downtime")
+    parser.add_argument('--index', default="/data/music_index", help="index root holding versions/ and current")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="build, validate and promote a new version")
+    build_parser.add_argument('--csv', default="/data/music_enriched.csv")
+    build_parser.add_argument('--smoke-queries', default="/data/queries.json",
+                              help="queries.json or one query per line, each must return hits")
+    build_parser.add_argument('--keep', type=int, default=3, help="versions kept for rollback")
+    build_parser.add_argument('--incremental', action='store_true', help="start from a copy of the current version")
+    build_parser.add_argument('--threads', type=int, default=1)
+    build_parser.add_argument('--shards', type=int, default=1)
+    build_parser.add_argument('--term-vectors', action='store_true')
+    build_parser.add_argument('--vectors', action='store_true')
+    build_parser.add_argument('--index-sort', action='store_true')
+
+    rollback_parser = subparsers.add_parser('rollback', help="promote an earlier version")
+    rollback_parser.add_argument('version', nargs='?', default=None, help="version name (default: the previous one)")
+
+    subparsers.add_parser('list', help="list versions")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        version = rebuild(args.csv, args.index, args.smoke_queries, keep=args.keep, incremental=args.incremental,
+                          threads=args.threads, shards=args.shards, term_vectors=args.term_vectors,
+                          vectors=args.vectors, index_sort=args.index_sort)
+        if version is None:
+            raise SystemExit(1)
+    elif args.command == 'rollback':
+        rollback(args.index, args.version)
+    else:
+        current = current_version(args.index)
+        for version in list_versions(args.index):
+            print(f"{version}{'  (current)' if version == current else ''}")
+
+if __name__ == "__main__":
+    main()
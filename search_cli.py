@@ -3,9 +3,79 @@ Interactive CLI for PyLucene Music Search Engine
 Persistent search interface
 """
 import lucene
-from searcher import MusicSearcher
+import time
+from searcher import open_searcher, SORTS
 
-def main():
+PAGE_SIZE = 10
+
+# Hits shown per collection by the group command
+PER_GROUP = 3
+
+# mode command: keyword = multi_field_search, semantic/hybrid = semantic_search
+SEARCH_MODES = ('keyword', 'semantic', 'hybrid')
+
+def print_result(i, result):
+    """Print one search result"""
+    # Check if this is from original music data (has name) or only Wikipedia
+    name = result.get('name')
+    has_music_data = name is not None and name.strip() != '' and name != 'None'
+    has_wiki_data = result.get('wiki_title') and result['wiki_title'].strip()
+    
+    if has_music_data:
+        # Original music data exists - show music info
+        print(f"\n{i}. {result['name']}")
+        print(f"   Composer: {result['composer']}")
+        
+        if has_wiki_data:
+            # Also has Wikipedia enrichment
+            print(f"   Wikipedia: {result['wiki_title']}")
+            if result.get('info_catalogue') and result['info_catalogue'].strip():
+                print(f"   Catalogue: {result['info_catalogue']}")
+            if result.get('info_opus') and result['info_opus'].strip():
+                print(f"   Opus: {result['info_opus']}")
+            if result.get('info_genre') and result['info_genre'].strip():
+                print(f"   Genre: {result['info_genre']}")
+            if result.get('info_composed') and result['info_composed'].strip():
+                print(f"   Composed: {result['info_composed']}")
+        
+        print(f"   Key: {result.get('key', 'N/A')}, Year: {result.get('year', 'N/A')}, Level: {result.get('level', 'N/A')}")
+    
+    else:
+        # Only Wikipedia data (unmatched wiki entry)
+        wiki_title = result.get('wiki_title', 'Unknown')
+        print(f"\n{i}. {wiki_title}")
+        composer = result.get('info_composer') or result.get('wiki_composer')
+        if composer and composer.strip():
+            print(f"   Composer: {composer}")
+        if result.get('info_key') and result['info_key'].strip():
+            print(f"   Key: {result['info_key']}")
+        if result.get('info_catalogue') and result['info_catalogue'].strip():
+            print(f"   Catalogue: {result['info_catalogue']}")
+        if result.get('info_opus') and result['info_opus'].strip():
+            print(f"   Opus: {result['info_opus']}")
+        if result.get('info_form') and result['info_form'].strip():
+            print(f"   Form: {result['info_form']}")
+        if result.get('info_genre') and result['info_genre'].strip():
+            print(f"   Genre: {result['info_genre']}")
+        if result.get('info_composed') and result['info_composed'].strip():
+            print(f"   Composed: {result['info_composed']}")
+        print(f"   [Wikipedia only]")
+    
+    print(f"   Score: {result['score']:.3f}")
+
+def print_profile(profile):
+    """Print timings, hit count and Lucene query of a profiled search"""
+    timings = ', '.join(f"{phase[:-3]} {ms:.2f}" for phase, ms in profile['timings'].items())
+    print("-" * 60)
+    print(f"Lucene query: {profile['lucene_query']}")
+    total = f"{profile['total_hits']}{'' if profile['exact_total'] else '+'}"
+    print(f"Total hits: {total}{' (cached)' if profile['cache_hit'] else ''}")
+    print(f"Timings (ms): {timings}")
+    for entry in profile['explain']:
+        print(f"\nExplain doc {entry['doc']}:\n{entry['explanation']}")
+
+def main(searcher=None):
+    """Interactive search loop; pass an open searcher to reuse it (it is left open)"""
     # Initialize VM if not already running
     if not lucene.getVMEnv():
         lucene.initVM()
@@ -15,6 +85,14 @@ def main():
     print("=" * 60)
     print("\nCommands:")
     print("  <query>         - Search for music")
+    print("  more            - Show the next page of results")
+    print("  sort <order>    - Order by relevance, year, -year, level or -level")
+    print("  suggest <text>  - Complete a name, composer or catalogue number")
+    print("  similar <n>     - Pieces similar to result number n")
+    print("  mode <mode>     - Match by keyword (default), semantic (vectors) or hybrid")
+    print("  group           - Toggle collapsing results by collection (album, set)")
+    print("  profile         - Toggle per-query timings and the Lucene query")
+    print("  explain         - Toggle score explanations for the top 3 hits")
     print("  back            - Return to main menu")
     print("  quit/exit       - Exit program")
     print("\nSearch examples:")
@@ -29,7 +107,23 @@ def main():
     print("  sonata year:1850-1900 difficulty:hard - All filters combined")
     print("=" * 60)
     
-    searcher = MusicSearcher("/data/music_index")
+    own_searcher = searcher is None
+    if own_searcher:
+        # Pick up index rebuilds while the CLI is running
+        searcher, timings = open_searcher("/data/music_index", "/data/queries.json", refresh_interval=5.0)
+        print(f"Ready: index open {timings['open_ms']:.0f} ms, warm-up {timings['warmup_queries']} queries "
+              f"{timings['warmup_ms']:.0f} ms")
+    
+    sort = 'relevance'
+    mode = 'keyword'
+    profile = False
+    explain = 0
+    group_by = None
+    last_query = None
+    last_sort = None
+    last_page = None
+    # Every result shown for the current query, numbered from 1
+    listed = []
     
     try:
         while True:
@@ -48,65 +142,110 @@ def main():
                     print("Returning to menu...")
                     break
                 
-                print(f"\nSearching for: '{user_input}'")
-                print("-" * 60)
+                if user_input.lower() == 'sort' or user_input.lower().startswith('sort '):
+                    order = user_input[4:].strip().lower() or 'relevance'
+                    if order not in SORTS:
+                        print(f"Unknown sort order. Use one of: {', '.join(SORTS)}")
+                    else:
+                        sort = order
+                        print(f"Sorting by {sort}")
+                    continue
+                
+                if user_input.lower().startswith('suggest '):
+                    start_time = time.perf_counter()
+                    suggestions = searcher.suggest(user_input[8:], n=PAGE_SIZE)
+                    elapsed_ms = (time.perf_counter() - start_time) * 1000.0
+                    if not suggestions:
+                        print("No suggestions (is the suggester built? re-run the indexer)")
+                    for suggestion in suggestions:
+                        print(f"  {suggestion['text']}  [{suggestion['field']}, {suggestion['weight']} piece(s)]")
+                    print(f"({elapsed_ms:.2f} ms)")
+                    continue
+                
+                if user_input.lower().startswith('similar '):
+                    number = user_input[8:].strip()
+                    if not number.isdigit() or not 1 <= int(number) <= len(listed):
+                        print(f"Give a result number between 1 and {len(listed)}")
+                        continue
+                    source = listed[int(number) - 1]
+                    print(f"\nPieces similar to: {source.get('name') or source.get('wiki_title')}")
+                    print("-" * 60)
+                    similar = searcher.similar(source['doc_id'], n=PAGE_SIZE)
+                    if not similar:
+                        print("No similar pieces found.")
+                    for i, result in enumerate(similar, 1):
+                        print_result(i, result)
+                    continue
+                
+                if user_input.lower() == 'mode' or user_input.lower().startswith('mode '):
+                    new_mode = user_input[4:].strip().lower() or 'keyword'
+                    if new_mode not in SEARCH_MODES:
+                        print(f"Unknown mode. Use one of: {', '.join(SEARCH_MODES)}")
+                    else:
+                        mode = new_mode
+                        print(f"Search mode: {mode}")
+                    continue
+                
+                if user_input.lower() == 'group':
+                    group_by = None if group_by else 'collection'
+                    print(f"Grouping by collection {'on' if group_by else 'off'}")
+                    continue
+                
+                if user_input.lower() == 'profile':
+                    profile = not profile
+                    print(f"Profiling {'on' if profile else 'off'}")
+                    continue
+                
+                if user_input.lower() == 'explain':
+                    explain = 0 if explain else 3
+                    print(f"Explanations {'on' if explain else 'off'}")
+                    continue
                 
-                results = searcher.multi_field_search(user_input, max_results=20)
+                if user_input.lower() == 'more':
+                    if last_page is None or last_page.next_cursor is None:
+                        print("No more results.")
+                        continue
+                    # Search-after: the next page costs the same as the first one
+                    results = searcher.multi_field_search(last_query, max_results=PAGE_SIZE, fields='display',
+                                                          sort=last_sort, after=last_page.next_cursor,
+                                                          profile=profile, explain=explain)
+                else:
+                    print(f"\nSearching for: '{user_input}'")
+                    print("-" * 60)
+                    
+                    last_query = user_input
+                    last_sort = sort
+                    listed = []
+                    if mode == 'keyword':
+                        results = searcher.multi_field_search(user_input, max_results=PAGE_SIZE, fields='display',
+                                                              sort=sort, profile=profile, explain=explain,
+                                                              group_by=group_by, per_group=PER_GROUP)
+                    else:
+                        # Vector modes return a single page ranked by similarity
+                        results = searcher.semantic_search(user_input, max_results=PAGE_SIZE, fields='display',
+                                                           hybrid=mode == 'hybrid')
                 
+                last_page = results
                 if not results:
                     print("No results found.")
+                elif results.groups is not None:
+                    for group in results.groups:
+                        print(f"\n=== {group.name or 'Single piece'} ({group.total_hits} match(es)) ===")
+                        for i, result in enumerate(group, len(listed) + 1):
+                            print_result(i, result)
+                        listed.extend(group)
+                    print(f"\nShowing {len(results.groups)} of {results.total_groups} collections "
+                          f"({results.total_hits} results)")
                 else:
-                    for i, result in enumerate(results, 1):
-                        # Check if this is from original music data (has name) or only Wikipedia
-                        name = result.get('name')
-                        has_music_data = name is not None and name.strip() != '' and name != 'None'
-                        has_wiki_data = result.get('wiki_title') and result['wiki_title'].strip()
-                        
-                        if has_music_data:
-                            # Original music data exists - show music info
-                            print(f"\n{i}. {result['name']}")
-                            print(f"   Composer: {result['composer']}")
-                            
-                            if has_wiki_data:
-                                # Also has Wikipedia enrichment
-                                print(f"   Wikipedia: {result['wiki_title']}")
-                                if result.get('info_catalogue') and result['info_catalogue'].strip():
-                                    print(f"   Catalogue: {result['info_catalogue']}")
-                                if result.get('info_opus') and result['info_opus'].strip():
-                                    print(f"   Opus: {result['info_opus']}")
-                                if result.get('info_genre') and result['info_genre'].strip():
-                                    print(f"   Genre: {result['info_genre']}")
-                                if result.get('info_composed') and result['info_composed'].strip():
-                                    print(f"   Composed: {result['info_composed']}")
-                            
-                            print(f"   Key: {result.get('key', 'N/A')}, Year: {result.get('year', 'N/A')}, Level: {result.get('level', 'N/A')}")
-                        
-                        else:
-                            # Only Wikipedia data (unmatched wiki entry)
-                            wiki_title = result.get('wiki_title', 'Unknown')
-                            print(f"\n{i}. {wiki_title}")
-                            composer = result.get('info_composer') or result.get('wiki_composer')
-                            if composer and composer.strip():
-                                print(f"   Composer: {composer}")
-                            if result.get('info_key') and result['info_key'].strip():
-                                print(f"   Key: {result['info_key']}")
-                            if result.get('info_catalogue') and result['info_catalogue'].strip():
-                                print(f"   Catalogue: {result['info_catalogue']}")
-                            if result.get('info_opus') and result['info_opus'].strip():
-                                print(f"   Opus: {result['info_opus']}")
-                            if result.get('info_form') and result['info_form'].strip():
-                                print(f"   Form: {result['info_form']}")
-                            if result.get('info_genre') and result['info_genre'].strip():
-                                print(f"   Genre: {result['info_genre']}")
-                            if result.get('info_composed') and result['info_composed'].strip():
-                                print(f"   Composed: {result['info_composed']}")
-                            print(f"   [Wikipedia only]")
-                        
-                        print(f"   Score: {result['score']:.3f}")
-                        if i >= 10:  # Show top 10 by default
-                            if len(results) > 10:
-                                print(f"\n... and {len(results) - 10} more results")
-                            break
+                    for i, result in enumerate(results, len(listed) + 1):
+                        print_result(i, result)
+                    listed.extend(results)
+                    if results.next_cursor is not None:
+                        total = f"{results.total_hits}{'' if results.exact_total else '+'}"
+                        print(f"\nShowing {len(listed)} of {total} results - type 'more' for the next page")
+                
+                if (profile or explain) and results.profile:
+                    print_profile(results.profile)
                 
             except EOFError:
                 print("\nGoodbye!")
@@ -119,7 +258,8 @@ def main():
                 traceback.print_exc()
     
     finally:
-        searcher.close()
+        if own_searcher:
+            searcher.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,168 +3,1209 @@ PyLucene Music Search Engine - Searcher
 Search indexed music with AND/OR queries, filters, and weighting
 """
 import lucene
+import base64
+import json
+import logging
+import os
 import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
 from org.apache.lucene.analysis.standard import StandardAnalyzer
-from org.apache.lucene.index import DirectoryReader
 from org.apache.lucene.queryparser.classic import QueryParser, MultiFieldQueryParser
-from org.apache.lucene.search import IndexSearcher, BooleanQuery, BooleanClause
+from org.apache.lucene.search import BooleanQuery, BooleanClause, SearcherManager, SearcherFactory, Sort, SortField, ScoreDoc, FieldDoc, TopDocs, TopFieldDocs, TopScoreDocCollectorManager, TopFieldCollectorManager, TopFieldCollector, MatchAllDocsQuery, IndexSearcher, TermQuery, ConstantScoreQuery, BoostQuery, KnnFloatVectorQuery, TotalHits
+from org.apache.lucene.index import DirectoryReader, MultiReader, ReaderManager, LeafReaderContext, Term
+from org.apache.lucene.queries.mlt import MoreLikeThis
+from org.apache.lucene.search.grouping import GroupingSearch
+from org.apache.lucene.facet import FacetsConfig, FacetsCollectorManager
+from org.apache.lucene.facet.sortedset import DefaultSortedSetDocValuesReaderState, SortedSetDocValuesFacetCounts
 from org.apache.lucene.document import IntPoint
-from org.apache.lucene.store import FSDirectory
+from org.apache.lucene.store import MMapDirectory, FSDirectory
+from org.apache.lucene.util import BytesRef
 from java.nio.file import Paths
-from java.util import HashMap
-from java.lang import Float
+from java.util import HashMap, HashSet
+from java.lang import Float, Integer, Long
+from java.util.concurrent import Executors
+from lucene import JArray
+from catalogue import catalogue_query
+from suggest import TypeAheadSuggester, filter_contexts, read_version, suggest_dir
+from vectors import VectorModel, model_path
+
+# Index switches and refresh failures of background refresh threads, silent unless configured
+logger = logging.getLogger('music_search')
+
+# Fields searched by multi_field_search and their boosts
+SEARCH_FIELDS = ["name", "composer", "description", "summary", "wiki_title", "wiki_paragraph", "info_genre", "info_form", "info_movements"]
+FIELD_BOOSTS = {
+    "name": 3.0,
+    "composer": 2.5,
+    "wiki_title": 2.0,
+    "wiki_paragraph": 1.5,
+    "info_genre": 1.2,
+    "description": 1.0,
+    "summary": 1.0,
+    "info_form": 0.8,
+    "info_movements": 0.8
+}
+
+# Text fields "more like this" draws a piece's top terms from (term vectors optional, see indexer)
+SIMILAR_FIELDS = ["name", "composer", "description", "summary", "wiki_paragraph", "info_genre", "info_form", "related"]
+
+# HNSW vector field written by the indexer with vectors=True
+KNN_FIELD = 'vector'
+
+# Keyword field of normalized catalogue numbers ("op 10 no 1", "bwv 846"), see catalogue.py
+CATALOGUE_FIELD = 'catalogue_id'
+
+# Hybrid ranking weight of the vector score (cosine mapped to 0..1) against the BM25 text score
+VECTOR_WEIGHT = 10.0
+
+# Graph candidates explored per k-NN query, the top max_results of them are returned
+KNN_CANDIDATES = 100
+
+# difficulty:<name> -> level range
+DIFFICULTY_RANGES = {
+    'easy': (0, 2),
+    'intermediate': (3, 5),
+    'medium': (3, 5),
+    'hard': (6, 10)
+}
+
+# Facet dimensions written by the indexer (difficulty holds the DIFFICULTY_RANGES bucket name)
+FACET_DIMS = ('period', 'key', 'composer', 'difficulty')
+
+# Filter grammar: year:1850, year:1850-1875, difficulty:easy|intermediate|medium|hard
+FILTER_PATTERN = re.compile(r'(?:year:(\d{4})(?:-(\d{4}))?|difficulty:(easy|intermediate|medium|hard))\s*', re.IGNORECASE)
+
+# Stored fields loaded per projection preset, any other iterable of field names works too
+PROJECTIONS = {
+    'id': ('doc_id', 'name'),
+    'display': ('doc_id', 'name', 'composer', 'key', 'year', 'level', 'wiki_title', 'wiki_composer', 'info_composer', 'info_key',
+                'info_catalogue', 'info_opus', 'info_form', 'info_genre', 'info_composed', 'group_name'),
+    'full': ('doc_id', 'name', 'composer', 'key', 'year', 'level', 'period', 'url', 'wiki_title', 'wiki_composer',
+             'info_composer', 'info_key', 'info_catalogue', 'info_opus', 'info_form', 'info_genre', 'info_composed',
+             'group_name')
+}
+
+# sort= values: doc-values fields to sort on (field, descending), relevance breaks remaining ties
+SORTS = {
+    'relevance': (),
+    'year': (('year_sort', False), ('level_sort', False)),
+    '-year': (('year_sort', True), ('level_sort', False)),
+    'level': (('level_sort', False), ('year_sort', False)),
+    '-level': (('level_sort', True), ('year_sort', False))
+}
+
+# group_by= values: sorted doc-values field written by the indexer, one value per collection
+GROUP_FIELDS = {
+    'collection': 'group_key'
+}
+
+# Separates composer and group_name in a collection key ("Sonatas" exists for many composers);
+# a piece outside any collection is keyed by its doc_id and forms a group of its own
+GROUP_SEPARATOR = '\x1f'
+
+# RAM for caching the first grouping pass, so the second pass replays it instead of searching again
+GROUPING_CACHE_MB = 16.0
+
+# SORTS entry a sorted index is stored in (indexer index_sort=True); searches in that order stop early
+INDEX_SORT = 'year'
+
+# Hits counted exactly unless exact_total is asked for, beyond that total_hits is a lower bound
+TOTAL_HITS_THRESHOLD = 100
+
+# Written by the indexer into a sharded index directory, lists the shard subdirectories
+SHARD_MANIFEST = 'shards.json'
+
+# Symlink in the index directory naming the live version (see rebuild.py)
+CURRENT_LINK = 'current'
+
+def resolve_index_dir(index_dir):
+    """Directory holding the live index: the target of index_dir/current if there is one, else index_dir"""
+    link = os.path.join(index_dir, CURRENT_LINK)
+    if os.path.exists(link):
+        return os.path.realpath(link)
+    return index_dir
+
+def shard_paths(index_dir):
+    """Shard directories of a sharded index, None for a plain single-directory index"""
+    manifest_path = os.path.join(index_dir, SHARD_MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    return [os.path.join(index_dir, name) for name in manifest['dirs']]
+
+def build_sort(name, tiebreak=True):
+    """Lucene Sort for a SORTS entry, None for plain relevance order
+    
+    tiebreak=False leaves out the relevance tie-break: that is the index sort
+    for INDEX_SORT, and searching in it lets collection terminate early.
+    """
+    if not SORTS[name]:
+        return None
+    sort_fields = []
+    for field, descending in SORTS[name]:
+        sort_field = SortField(field, SortField.Type.LONG, descending)
+        # Pieces without a year/level go last in both directions
+        sort_field.setMissingValue(Long(Long.MIN_VALUE if descending else Long.MAX_VALUE))
+        sort_fields.append(sort_field)
+    if tiebreak:
+        sort_fields.append(SortField.FIELD_SCORE)
+    return Sort(sort_fields)
+
+def encode_cursor(sort, hit):
+    """Opaque search-after cursor for the last hit of a page"""
+    state = {'sort': sort, 'doc': hit.doc, 'score': hit.score}
+    if SORTS[sort]:
+        values = FieldDoc.cast_(hit).fields
+        state['values'] = [Long.cast_(value).longValue() for value in values[:len(SORTS[sort])]]
+    return base64.urlsafe_b64encode(json.dumps(state).encode('utf-8')).decode('ascii')
+
+def decode_cursor(sort, cursor, tiebreak=True):
+    """ScoreDoc/FieldDoc to search after, raises ValueError for a foreign or broken cursor
+    
+    tiebreak must match the build_sort the next page is searched with.
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        doc, score = int(state['doc']), float(state['score'])
+        values = [int(value) for value in state.get('values', [])]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("invalid cursor")
+    if state.get('sort') != sort:
+        raise ValueError(f"cursor belongs to sort '{state.get('sort')}', not '{sort}'")
+    if not SORTS[sort]:
+        return ScoreDoc(doc, score)
+    fields = [Long(value) for value in values]
+    if tiebreak:
+        fields.append(Float(score))
+    return FieldDoc(doc, score, JArray('object')(fields))
+
+class SearchPage(list):
+    """One page of SearchResults plus total hit count, the cursor of the next page and facet counts
+    
+    exact_total is False when total_hits is only a lower bound (counting
+    stopped early). profile holds per-phase timings when the search was profiled. A grouped
+    search lists the best hit of each group and keeps the SearchGroups in
+    groups, total_groups counts all matching groups.
+    """
+    __slots__ = ('total_hits', 'next_cursor', 'facets', 'profile', 'groups', 'total_groups', 'exact_total')
+    
+    def __init__(self, results=(), total_hits=0, next_cursor=None, facets=None, groups=None, total_groups=None,
+                 exact_total=True):
+        super().__init__(results)
+        self.total_hits = total_hits
+        self.next_cursor = next_cursor
+        self.facets = facets
+        self.profile = None
+        self.groups = groups
+        self.total_groups = total_groups
+        self.exact_total = exact_total
+    
+    def copy(self):
+        return SearchPage(self, self.total_hits, self.next_cursor, self.facets, self.groups, self.total_groups,
+                          self.exact_total)
+
+class SearchGroup(list):
+    """Top SearchResults of one group, plus the group key and its total hit count
+    
+    name is the collection (group_name), None for a piece outside any collection.
+    """
+    __slots__ = ('key', 'total_hits')
+    
+    def __init__(self, results, key, total_hits):
+        super().__init__(results)
+        self.key = key
+        self.total_hits = total_hits
+    
+    @property
+    def name(self):
+        if GROUP_SEPARATOR not in self.key:
+            return None
+        return self.key.split(GROUP_SEPARATOR, 1)[1]
+    
+    def to_dict(self):
+        return {
+            'collection': self.name,
+            'total_hits': self.total_hits,
+            'results': [result.to_dict() for result in self]
+        }
+    
+    def __repr__(self):
+        return f"SearchGroup(name={self.name!r}, total_hits={self.total_hits}, results={len(self)})"
+
+class SearchResult:
+    """One hit: score plus the projected stored fields
+    
+    Field values are decoded from the loaded Java Document on first access.
+    Supports the read-only dict protocol (result['name'], result.get('key')).
+    """
+    __slots__ = ('score', 'doc', 'fields', '_document', '_values')
+    
+    def __init__(self, score, doc, fields, document):
+        self.score = score
+        self.doc = doc
+        self.fields = fields
+        self._document = document
+        self._values = None
+    
+    def _value(self, field):
+        if self._values is None:
+            self._values = {}
+        if field not in self._values:
+            self._values[field] = self._document.get(field)
+        return self._values[field]
+    
+    def __getitem__(self, field):
+        if field == 'score':
+            return self.score
+        if field not in self.fields:
+            raise KeyError(field)
+        return self._value(field)
+    
+    def __contains__(self, field):
+        return field == 'score' or field in self.fields
+    
+    def get(self, field, default=None):
+        if field not in self:
+            return default
+        return self[field]
+    
+    def keys(self):
+        return ('score',) + tuple(self.fields)
+    
+    def to_dict(self):
+        return {field: self[field] for field in self.keys()}
+    
+    def __repr__(self):
+        return f"SearchResult(score={self.score:.3f}, name={self.get('name')!r})"
+
+# Query syntax operators are case-sensitive, everything else is lowercased by the analyzer
+QUERY_OPERATORS = {'AND', 'OR', 'NOT', 'TO'}
+
+def boost_key(boosts):
+    """Hashable form of a boost configuration, None for the default FIELD_BOOSTS"""
+    if boosts is None or isinstance(boosts, tuple):
+        return boosts
+    return tuple(sorted((field, float(boost)) for field, boost in boosts.items()))
+
+def normalize_query(query_text):
+    """Canonical form of a query for cache keys: collapsed whitespace, lowercased terms"""
+    return ' '.join(token if token in QUERY_OPERATORS else token.lower() for token in query_text.split())
+
+class ResultCache:
+    """Thread-safe bounded LRU cache of search results
+    
+    Entries belong to one index generation (reader version); the cache empties
+    itself as soon as it is asked about a different generation.
+    """
+    
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+    
+    def get(self, key, generation):
+        with self._lock:
+            if generation != self._generation:
+                self._entries.clear()
+                self._generation = generation
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key, generation, value):
+        with self._lock:
+            # Results computed on an older reader must not outlive a refresh
+            if generation != self._generation:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'max_size': self.max_size
+            }
+
+def load_warmup_queries(path):
+    """Warm-up queries from a queries.json-style file or a text file with one query per line"""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            return [entry['query'] for entry in json.load(f)['queries']]
+        return [line.strip() for line in f if line.strip()]
+
+def open_searcher(index_dir, warmup_file=None, **kwargs):
+    """Open a MusicSearcher and warm it up before it takes user queries
+    
+    Returns (searcher, timings) with open/first-query/warm-up times in ms;
+    kwargs go to MusicSearcher.
+    """
+    start = time.perf_counter()
+    searcher = MusicSearcher(index_dir, **kwargs)
+    opened = time.perf_counter()
+    queries = load_warmup_queries(warmup_file)
+    first, total = searcher.warm_up(queries)
+    return searcher, {
+        'open_ms': (opened - start) * 1000.0,
+        'first_query_ms': first * 1000.0,
+        'warmup_ms': total * 1000.0,
+        'warmup_queries': len(queries)
+    }
+
+class QueryLog:
+    """JSON-lines query log, rotated by size (path, path.1, ... path.<backups>)"""
+    
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backups=5):
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        self._handler.setFormatter(logging.Formatter('%(message)s'))
+        self._logger = logging.getLogger(f"music_search.query_log.{id(self)}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._logger.addHandler(self._handler)
+    
+    def write(self, record):
+        record = dict(record, ts=time.strftime('%Y-%m-%dT%H:%M:%S%z'))
+        self._logger.info(json.dumps(record, ensure_ascii=False))
+    
+    def close(self):
+        self._logger.removeHandler(self._handler)
+        self._handler.close()
+
+class ShardSearcherManager:
+    """SearcherManager counterpart for a sharded index
+    
+    Each shard has its own ReaderManager. The current IndexSearcher runs over
+    a MultiReader of all shard readers, so term statistics and scores are
+    global, and it searches its leaf slices concurrently on executor, merging
+    the per-slice top hits. acquire()/release() reference-count that reader.
+    """
+    
+    def __init__(self, paths, executor, label=''):
+        self.executor = executor
+        self.label = label
+        self.managers = [ReaderManager(MMapDirectory(Paths.get(path))) for path in paths]
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # Open (searcher, generation) pairs, the last one is current
+        self._open = [self._open_searcher()]
+    
+    def _open_searcher(self):
+        readers = [manager.acquire() for manager in self.managers]
+        try:
+            # Not closing the sub readers makes the MultiReader hold its own reference on each
+            reader = MultiReader(readers, False)
+            generation = ':'.join([self.label] + [str(shard.getVersion()) for shard in readers])
+        finally:
+            for manager, shard in zip(self.managers, readers):
+                manager.release(shard)
+        return IndexSearcher(reader, self.executor), generation
+    
+    def acquire(self):
+        with self._lock:
+            searcher = self._open[-1][0]
+            searcher.getIndexReader().incRef()
+            return searcher
+    
+    def release(self, searcher):
+        searcher.getIndexReader().decRef()
+    
+    def generation(self, searcher):
+        """Label and shard reader versions behind an acquired searcher, e.g. 'music_index:12:9:15'
+        
+        None if the searcher does not come from this manager.
+        """
+        reader = searcher.getIndexReader()
+        with self._lock:
+            for open_searcher, generation in self._open:
+                if open_searcher.getIndexReader().equals(reader):
+                    return generation
+        return None
+    
+    def isSearcherCurrent(self):
+        for manager in self.managers:
+            reader = manager.acquire()
+            try:
+                if not reader.isCurrent():
+                    return False
+            finally:
+                manager.release(reader)
+        return True
+    
+    def maybeRefresh(self):
+        with self._refresh_lock:
+            for manager in self.managers:
+                manager.maybeRefresh()
+            searcher, generation = self._open_searcher()
+            with self._lock:
+                if generation == self._open[-1][1]:
+                    searcher.getIndexReader().decRef()
+                    return
+                retired = self._open[-1][0]
+                self._open.append((searcher, generation))
+                # Forget searchers nobody holds anymore
+                self._open = [entry for entry in self._open if entry[0].getIndexReader().getRefCount() > 0]
+            retired.getIndexReader().decRef()
+    
+    def close(self):
+        with self._lock:
+            self._open[-1][0].getIndexReader().decRef()
+        for manager in self.managers:
+            manager.close()
 
 class MusicSearcher:
-    def __init__(self, index_dir):
+    def __init__(self, index_dir, refresh_interval=None, cache_size=1024, query_log=None, search_threads=None):
+        """Open the index behind a SearcherManager
+        
+        If index_dir has a 'current' link (see rebuild.py) the version it
+        names is opened, and maybe_refresh() moves to a newly promoted version
+        while searches on the old one finish undisturbed.
+        A sharded index (see indexer.create_index(shards=N)) is opened behind
+        a ShardSearcherManager instead, which runs each query on a pool of
+        search_threads threads (default: one per shard).
+        With refresh_interval (seconds) a background thread calls
+        maybe_refresh() so new index commits are picked up without a restart.
+        multi_field_search results are kept in an LRU cache of cache_size
+        entries (0 disables it). With query_log (a file path) every
+        multi_field_search is profiled and appended to a rotating JSONL log.
+        """
         # Don't initialize VM here - let caller handle it
         if not lucene.getVMEnv():
             lucene.initVM()
-        store = FSDirectory.open(Paths.get(index_dir))
-        self.reader = DirectoryReader.open(store)
-        self.searcher = IndexSearcher(self.reader)
+        self.index_dir = index_dir
+        self.search_threads = search_threads
+        self._executor = None
+        self._switch_lock = threading.Lock()
+        # Managers of versions switched away from, still asked for generations of searches in flight
+        self._retired = deque(maxlen=8)
+        self.active_dir = resolve_index_dir(index_dir)
+        self.manager, self.shards = self._open_manager(self.active_dir)
         self.analyzer = StandardAnalyzer()
+        self.cache = ResultCache(cache_size) if cache_size else None
+        # similar() pages per source piece, kept apart so searches don't evict them
+        self.similar_cache = ResultCache(cache_size) if cache_size else None
+        self.query_log = QueryLog(query_log) if query_log else None
+        
+        # Compiled once per searcher: boosts as a Java map. Query parsers are
+        # not thread-safe, so each thread gets its own (see _parser)
+        self.boost_map = HashMap()
+        for field, boost in FIELD_BOOSTS.items():
+            self.boost_map.put(field, Float(boost))
+        self._local = threading.local()
+        self._field_sets = {}
+        self._sorts = {name: build_sort(name) for name in SORTS}
+        self._index_sort = build_sort(INDEX_SORT, tiebreak=False)
+        # (generation, whether all its segments are stored in INDEX_SORT order)
+        self._index_sorted = None
+        self._facet_state = None
+        self._facet_lock = threading.Lock()
+        self._suggester = None
+        self._suggest_lock = threading.Lock()
+        self._vector_state = None
+        self._vector_lock = threading.Lock()
+        
+        self._closed = threading.Event()
+        self._refresher = None
+        if refresh_interval:
+            self._refresher = threading.Thread(target=self._refresh_loop, args=(refresh_interval,), daemon=True)
+            self._refresher.start()
+    
+    def _open_manager(self, path):
+        """(manager, shard paths) for the index in path, shard paths None if it is not sharded"""
+        shards = shard_paths(path)
+        if shards:
+            if self._executor is None:
+                self._executor = Executors.newFixedThreadPool(self.search_threads or len(shards))
+            return ShardSearcherManager(shards, self._executor, os.path.basename(path)), shards
+        # Memory-mapped explicitly: index files are paged in by the OS, not read on open
+        store = MMapDirectory(Paths.get(path))
+        return SearcherManager(store, SearcherFactory()), None
+    
+    @contextmanager
+    def acquire(self):
+        """Borrow the current IndexSearcher, released again when the block exits"""
+        while True:
+            manager = self.manager
+            try:
+                searcher = manager.acquire()
+                break
+            except lucene.JavaError:
+                # Closed by a version switch between reading and using it
+                if manager is self.manager:
+                    raise
+        try:
+            yield searcher
+        finally:
+            manager.release(searcher)
+    
+    def generation(self, searcher):
+        """Version of the index behind an acquired searcher, changes with every commit and version switch"""
+        reader = searcher.getIndexReader()
+        if DirectoryReader.instance_(reader):
+            reader = DirectoryReader.cast_(reader)
+            path = FSDirectory.cast_(reader.directory()).getDirectory().toString()
+            return f"{os.path.basename(path)}:{reader.getVersion()}"
+        for manager in [self.manager] + list(self._retired):
+            if isinstance(manager, ShardSearcherManager):
+                generation = manager.generation(searcher)
+                if generation is not None:
+                    return generation
+        return None
+    
+    def maybe_refresh(self):
+        """Switch to the latest index commit or promoted version, returns True if it changed"""
+        active_dir = resolve_index_dir(self.index_dir)
+        if active_dir != self.active_dir:
+            self._switch(active_dir)
+            return True
+        
+        changed = not self.manager.isSearcherCurrent()
+        if changed:
+            self.manager.maybeRefresh()
+        
+        # The indexer rebuilds the suggester too, drop ours once it is outdated
+        suggester = self._suggester
+        if suggester is not None:
+            version = read_version(suggest_dir(self.active_dir))
+            if version is not None and version['version'] != suggester.version:
+                self._drop_suggester(suggester)
+        return changed
+    
+    def _switch(self, active_dir):
+        """Serve from another index version; searches holding the old one finish on it"""
+        with self._switch_lock:
+            if active_dir == self.active_dir:
+                return
+            manager, shards = self._open_manager(active_dir)
+            retired = self.manager
+            self.manager, self.shards, self.active_dir = manager, shards, active_dir
+            self._retired.append(retired)
+        # Closing only drops the manager's own reference, acquired searchers stay usable
+        retired.close()
+        logger.info("Switched to index version %s", os.path.basename(active_dir))
+        
+        suggester = self._suggester
+        if suggester is not None:
+            self._drop_suggester(suggester)
     
-    def search(self, query_text, field="name", max_results=10):
+    def _drop_suggester(self, suggester):
+        with self._suggest_lock:
+            if self._suggester is suggester:
+                self._suggester = None
+        suggester.close()
+    
+    def _refresh_loop(self, interval):
+        lucene.getVMEnv().attachCurrentThread()
+        while not self._closed.wait(interval):
+            try:
+                self.maybe_refresh()
+            except Exception:
+                logger.exception("Index refresh failed")
+    
+    def warm_up(self, queries, max_results=10):
+        """Run queries once to page in index data and warm the search path
+        
+        Returns (seconds for the first query, seconds for all of them).
+        """
+        start = time.perf_counter()
+        first = None
+        for query in queries:
+            self.multi_field_search(query, max_results=max_results, fields='display')
+            if first is None:
+                first = time.perf_counter() - start
+        return first or 0.0, time.perf_counter() - start
+    
+    def search_many(self, queries, max_results=10, workers=4, ordered=True, fields='id', **options):
+        """Run many queries on a bounded pool of JVM-attached threads, yields (query, SearchPage) pairs
+        
+        queries can be any iterable, also a lazy one: at most workers * 2
+        searches are queued or running at a time, so memory stays flat for
+        millions of queries. ordered=False yields each page as soon as it is
+        done instead of in input order. options go to multi_field_search
+        (sort, boosts, profile, ...); the first failing query raises.
+        """
+        env = lucene.getVMEnv()
+        pool = ThreadPoolExecutor(max_workers=workers, initializer=env.attachCurrentThread)
+        limit = workers * 2
+        # (query, future) in input order, or future -> query
+        pending = deque() if ordered else {}
+        
+        def submit(query):
+            return pool.submit(self.multi_field_search, query, max_results=max_results, fields=fields, **options)
+        
+        try:
+            for query in queries:
+                if ordered:
+                    pending.append((query, submit(query)))
+                    if len(pending) >= limit:
+                        done_query, future = pending.popleft()
+                        yield done_query, future.result()
+                else:
+                    pending[submit(query)] = query
+                    if len(pending) >= limit:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield pending.pop(future), future.result()
+            
+            while pending:
+                if ordered:
+                    done_query, future = pending.popleft()
+                    yield done_query, future.result()
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield pending.pop(future), future.result()
+        finally:
+            # Also runs when the caller stops iterating early
+            pool.shutdown(wait=True, cancel_futures=True)
+    
+    def cache_stats(self):
+        """Hit/miss/eviction counters and size of the result cache (similar() cache under 'similar')"""
+        if self.cache is None:
+            return None
+        stats = self.cache.stats()
+        stats['similar'] = self.similar_cache.stats()
+        return stats
+    
+    def search(self, query_text, field="name", max_results=10, fields='full'):
         """Simple single-field search"""
         parser = QueryParser(field, self.analyzer)
         # Call instance method explicitly
         query = QueryParser.parse(parser, query_text)
         
-        hits = self.searcher.search(query, max_results)
-        
-        results = []
-        for hit in hits.scoreDocs:
-            doc = self.searcher.storedFields().document(hit.doc)
-            results.append({
-                'score': hit.score,
-                'name': doc.get('name'),
-                'composer': doc.get('composer'),
-                'key': doc.get('key'),
-                'year': doc.get('year'),
-                'level': doc.get('level'),
-                'period': doc.get('period'),
-                'url': doc.get('url'),
-                'wiki_title': doc.get('wiki_title'),
-                'wiki_composer': doc.get('wiki_composer'),
-                'info_catalogue': doc.get('info_catalogue'),
-                'info_opus': doc.get('info_opus'),
-                'info_genre': doc.get('info_genre'),
-                'info_composed': doc.get('info_composed')
-            })
-        
-        return results
+        with self.acquire() as searcher:
+            hits = searcher.search(query, max_results)
+            return self._load_results(searcher, hits.scoreDocs, fields)
+    
+    def _projection(self, fields):
+        """Resolve a preset name or field list to (field tuple, Java field set)"""
+        names = PROJECTIONS[fields] if isinstance(fields, str) else tuple(fields)
+        field_set = self._field_sets.get(names)
+        if field_set is None:
+            field_set = HashSet()
+            for name in names:
+                field_set.add(name)
+            self._field_sets[names] = field_set
+        return names, field_set
+    
+    def _load_results(self, searcher, score_docs, fields):
+        """Load only the projected stored fields of each hit"""
+        names, field_set = self._projection(fields)
+        stored = searcher.storedFields()
+        return [SearchResult(hit.score, hit.doc, names, stored.document(hit.doc, field_set))
+                for hit in score_docs]
+    
+    def _parser(self, boosts=None):
+        """MultiFieldQueryParser for the calling thread and boost configuration, created on first use
+        
+        boosts overrides FIELD_BOOSTS (as a dict or boost_key() tuple); fields
+        missing from it get boost 1.0.
+        """
+        parsers = getattr(self._local, 'parsers', None)
+        if parsers is None:
+            parsers = self._local.parsers = {}
+        key = boost_key(boosts)
+        parser = parsers.get(key)
+        if parser is None:
+            boost_map = self.boost_map
+            if key is not None:
+                boost_map = HashMap()
+                for field, boost in key:
+                    boost_map.put(field, Float(boost))
+            parser = parsers[key] = MultiFieldQueryParser(SEARCH_FIELDS, self.analyzer, boost_map)
+        return parser
     
     def parse_query(self, query_text):
-        """Parse query to extract filters and main search text"""
+        """Parse query to extract filters and main search text
+        
+        The filter grammar is matched in a single pass; the first year: and
+        difficulty: filter win, all of them are removed from the text.
+        """
         filters = {
             'year_range': None,
             'difficulty': None
         }
         
-        # Extract year range: year:1850-1875 or year:1850
-        year_match = re.search(r'year:(\d{4})(?:-(\d{4}))?', query_text, re.IGNORECASE)
-        if year_match:
-            start_year = int(year_match.group(1))
-            end_year = int(year_match.group(2)) if year_match.group(2) else start_year
-            filters['year_range'] = (start_year, end_year)
-            # Remove year filter from query text
-            query_text = re.sub(r'year:\d{4}(?:-\d{4})?\s*', '', query_text, flags=re.IGNORECASE)
-        
-        # Extract difficulty filter: difficulty:easy, difficulty:hard, etc.
-        difficulty_match = re.search(r'difficulty:(easy|intermediate|medium|hard)', query_text, re.IGNORECASE)
-        if difficulty_match:
-            difficulty_value = difficulty_match.group(1).lower()
-            difficulty_keywords = {
-                'easy': (0, 2),
-                'intermediate': (3, 5),
-                'medium': (3, 5),
-                'hard': (6, 10)
-            }
-            if difficulty_value in difficulty_keywords:
-                filters['difficulty'] = difficulty_keywords[difficulty_value]
-            # Remove difficulty filter from query text
-            query_text = re.sub(r'difficulty:(easy|intermediate|medium|hard)\s*', '', query_text, flags=re.IGNORECASE)
+        def extract(match):
+            start_year, end_year, difficulty = match.groups()
+            if start_year and filters['year_range'] is None:
+                start_year = int(start_year)
+                filters['year_range'] = (start_year, int(end_year) if end_year else start_year)
+            elif difficulty and filters['difficulty'] is None:
+                filters['difficulty'] = DIFFICULTY_RANGES[difficulty.lower()]
+            return ''
         
+        query_text = FILTER_PATTERN.sub(extract, query_text)
         return query_text.strip(), filters
     
-    def multi_field_search(self, query_text, max_results=10):
-        """Search across name, composer, description, and Wikipedia fields with boosting"""
-        # Parse query for filters
-        clean_query, filters = self.parse_query(query_text)
-        
-        # Build the main text query
-        fields = ["name", "composer", "description", "summary", "wiki_title", "wiki_paragraph", "info_genre", "info_form", "info_movements"]
-        
-        # Create boost map
-        boosts = {
-            "name": 3.0,
-            "composer": 2.5,
-            "wiki_title": 2.0,
-            "wiki_paragraph": 1.5,
-            "info_genre": 1.2,
-            "description": 1.0,
-            "summary": 1.0,
-            "info_form": 0.8,
-            "info_movements": 0.8
-        }
-        
-        # Convert Python dict to Java HashMap for boosts
-        boost_map = HashMap()
-        for field, boost in boosts.items():
-            boost_map.put(field, Float(boost))
+    def _field_parser(self, field):
+        """Single-field QueryParser for the calling thread"""
+        parsers = getattr(self._local, 'field_parsers', None)
+        if parsers is None:
+            parsers = self._local.field_parsers = {}
+        parser = parsers.get(field)
+        if parser is None:
+            parser = parsers[field] = QueryParser(field, self.analyzer)
+        return parser
+    
+    def catalogue_lookup(self, ids):
+        """Exact-match query on CATALOGUE_FIELD for any of the ids, all hits score alike"""
+        if len(ids) == 1:
+            return ConstantScoreQuery(TermQuery(Term(CATALOGUE_FIELD, ids[0])))
+        builder = BooleanQuery.Builder()
+        for catalogue_id in ids:
+            builder.add(TermQuery(Term(CATALOGUE_FIELD, catalogue_id)), BooleanClause.Occur.SHOULD)
+        return ConstantScoreQuery(builder.build())
+    
+    def compile_query(self, clean_query, filters, boosts=None, field=None, catalogue=True):
+        """Build the final query: boosted text query + non-scoring filter clauses
         
-        # Create the boolean query builder
+        field restricts the text query to that one field, unboosted.
+        A text that is nothing but catalogue numbers ("bwv 846") becomes a term
+        lookup on CATALOGUE_FIELD instead of the multi-field parse, unless
+        catalogue=False or field is given.
+        Returns None if there is neither text nor a filter.
+        """
         builder = BooleanQuery.Builder()
         
         # Add the main text query if there's any text left
         if clean_query:
-            parser = MultiFieldQueryParser(fields, self.analyzer, boost_map)
-            text_query = MultiFieldQueryParser.parse(parser, clean_query)
+            catalogue_ids = catalogue_query(clean_query) if catalogue and field is None else None
+            if catalogue_ids:
+                text_query = self.catalogue_lookup(catalogue_ids)
+            elif field is None:
+                text_query = MultiFieldQueryParser.parse(self._parser(boosts), clean_query)
+            else:
+                text_query = QueryParser.parse(self._field_parser(field), clean_query)
             builder.add(text_query, BooleanClause.Occur.MUST)
         
         # Add year range filter
         if filters['year_range']:
             start_year, end_year = filters['year_range']
-            year_query = IntPoint.newRangeQuery('year_range', start_year, end_year)
-            builder.add(year_query, BooleanClause.Occur.MUST)
+            builder.add(IntPoint.newRangeQuery('year_range', start_year, end_year), BooleanClause.Occur.FILTER)
         
         # Add difficulty filter (level range)
         if filters['difficulty']:
             min_level, max_level = filters['difficulty']
-            level_query = IntPoint.newRangeQuery('level_range', min_level, max_level)
-            builder.add(level_query, BooleanClause.Occur.MUST)
+            builder.add(IntPoint.newRangeQuery('level_range', min_level, max_level), BooleanClause.Occur.FILTER)
         
         final_query = builder.build()
-        
-        # If no query components, return empty
         if final_query.clauses().size() == 0:
+            return None
+        return final_query
+    
+    def multi_field_search(self, query_text, max_results=10, fields='full', sort='relevance', after=None, boosts=None,
+                           profile=False, explain=0, group_by=None, per_group=1, exact_total=False):
+        """Search across name, composer, description, and Wikipedia fields with boosting
+        
+        fields selects the stored fields loaded per hit: a PROJECTIONS preset
+        ('id', 'display', 'full') or an iterable of field names.
+        sort is one of SORTS (relevance, year, -year, level, -level); pass the
+        returned page's next_cursor as after to fetch the following page.
+        boosts replaces FIELD_BOOSTS for this search, e.g. to compare configurations.
+        profile=True puts per-phase timings, hit count and the Lucene query on
+        the page's profile; explain=N adds score explanations of the top N hits.
+        group_by ('collection') collapses the hits by GROUP_FIELDS: max_results
+        then counts groups, each with up to per_group hits in page.groups.
+        Grouped pages have no cursor.
+        Unless exact_total, hits are only counted up to TOTAL_HITS_THRESHOLD
+        (page.exact_total tells), which lets filter-only queries and searches
+        in the index sort order skip documents that cannot reach the page.
+        """
+        if sort not in SORTS:
+            raise ValueError(f"unknown sort '{sort}', expected one of {', '.join(SORTS)}")
+        if group_by is not None and group_by not in GROUP_FIELDS:
+            raise ValueError(f"unknown group_by '{group_by}', expected one of {', '.join(GROUP_FIELDS)}")
+        if group_by is not None and after:
+            raise ValueError("grouped searches cannot be paged with a cursor")
+        after_doc = decode_cursor(sort, after) if after else None
+        explain = max(0, explain)
+        
+        timings = {}
+        start = last = time.perf_counter()
+        
+        def lap(phase):
+            nonlocal last
+            now = time.perf_counter()
+            timings[phase] = (now - last) * 1000.0
+            last = now
+        
+        # Parse query for filters
+        clean_query, filters = self.parse_query(query_text)
+        lap('filters_ms')
+        if not isinstance(fields, str):
+            fields = tuple(fields)
+        boosts = boost_key(boosts)
+        cache_key = (normalize_query(clean_query), filters['year_range'], filters['difficulty'], max_results, fields,
+                     sort, after, boosts, group_by, per_group, exact_total)
+        final_query = None
+        explanations = []
+        
+        with self.acquire() as searcher:
+            generation = self.generation(searcher)
+            results = None
+            if self.cache is not None and not explain:
+                results = self.cache.get(cache_key, generation)
+                lap('cache_ms')
+            cache_hit = results is not None
+            
+            if not cache_hit:
+                final_query = self.compile_query(clean_query, filters, boosts)
+                lap('parse_ms')
+                
+                # If no query components, return empty
+                if final_query is None:
+                    results = SearchPage()
+                else:
+                    lucene_sort = self._sorts[sort]
+                    if sort == INDEX_SORT and group_by is None and self._is_index_sorted(searcher, generation):
+                        # Without the score tie-break the sort is the index sort, segments stop after max_results
+                        lucene_sort = self._index_sort
+                        after_doc = decode_cursor(sort, after, tiebreak=False) if after else None
+                    
+                    def collect(query):
+                        if group_by is None:
+                            hits = self._top_docs(searcher, query, max_results, lucene_sort, after_doc, exact_total)
+                            return hits, hits.totalHits.value()
+                        hits = self._top_groups(searcher, query, group_by, max_results, per_group, sort)
+                        return hits, hits.totalHitCount
+                    
+                    hits, total_hits = collect(final_query)
+                    lap('search_ms')
+                    
+                    # Catalogue-shaped text no piece carries ("Op. 999") gets the regular parse
+                    if total_hits == 0 and clean_query and catalogue_query(clean_query):
+                        final_query = self.compile_query(clean_query, filters, boosts, catalogue=False)
+                        hits, total_hits = collect(final_query)
+                        lap('fallback_ms')
+                    
+                    if group_by is None:
+                        score_docs = hits.scoreDocs
+                        next_cursor = None
+                        if len(score_docs) == max_results:
+                            next_cursor = encode_cursor(sort, score_docs[len(score_docs) - 1])
+                        results = SearchPage(self._load_results(searcher, score_docs, fields), total_hits, next_cursor,
+                                             exact_total=hits.totalHits.relation() == TotalHits.Relation.EQUAL_TO)
+                    else:
+                        results = self._group_page(searcher, hits, fields)
+                    lap('fetch_ms')
+                    
+                    for result in results[:explain]:
+                        explanations.append({'doc': result.doc,
+                                             'explanation': searcher.explain(final_query, result.doc).toString()})
+                    if explanations:
+                        lap('explain_ms')
+                
+                if self.cache is not None and final_query is not None and not explain:
+                    self.cache.put(cache_key, generation, results)
+        
+        page = results.copy()
+        if profile or explain or self.query_log is not None:
+            timings['total_ms'] = (time.perf_counter() - start) * 1000.0
+            page.profile = {
+                'query': query_text,
+                'clean_query': clean_query,
+                'filters': filters,
+                'sort': sort,
+                'max_results': max_results,
+                'lucene_query': final_query.toString() if final_query is not None else None,
+                'total_hits': page.total_hits,
+                'exact_total': page.exact_total,
+                'group_by': group_by,
+                'returned': len(page),
+                'cache_hit': cache_hit,
+                'timings': timings,
+                'explain': explanations
+            }
+            if self.query_log is not None:
+                self.query_log.write(page.profile)
+        
+        return page
+    
+    def _is_index_sorted(self, searcher, generation):
+        """Whether every segment of the searcher's index is stored in INDEX_SORT order"""
+        state = self._index_sorted
+        if state is None or generation is None or state[0] != generation:
+            leaves = [LeafReaderContext.cast_(leaf) for leaf in searcher.getIndexReader().leaves()]
+            is_sorted = bool(leaves) and all(self._index_sort.equals(leaf.reader().getMetaData().sort())
+                                             for leaf in leaves)
+            state = self._index_sorted = (generation, is_sorted)
+        return state[1]
+    
+    def _top_docs(self, searcher, query, max_results, lucene_sort, after_doc=None, exact_total=True):
+        """Top hits by relevance or lucene_sort
+        
+        Without exact_total the collectors stop counting at TOTAL_HITS_THRESHOLD
+        and from then on skip non-competitive documents: constant-score
+        (filter-only) queries and a lucene_sort that is a prefix of the index
+        sort end each segment early, totalHits is then a lower bound.
+        """
+        threshold = Integer.MAX_VALUE if exact_total else max(max_results, TOTAL_HITS_THRESHOLD)
+        if lucene_sort is None:
+            manager = TopScoreDocCollectorManager(max_results, after_doc, threshold)
+            return TopDocs.cast_(searcher.search(query, manager))
+        after_field_doc = FieldDoc.cast_(after_doc) if after_doc is not None else None
+        manager = TopFieldCollectorManager(lucene_sort, max_results, after_field_doc, threshold)
+        hits = TopFieldDocs.cast_(searcher.search(query, manager))
+        # Scores are shown with every hit, also when they do not decide the order
+        TopFieldCollector.populateScores(hits.scoreDocs, searcher, query)
+        return hits
+    
+    def _top_groups(self, searcher, query, group_by, max_groups, per_group, sort):
+        """Best max_groups groups with their top per_group hits, collected in one pass over the index
+        
+        The first pass finds the top groups and caches matching docs and
+        scores; the second pass (top hits per group) replays that cache.
+        """
+        grouping = GroupingSearch(GROUP_FIELDS[group_by])
+        lucene_sort = self._sorts[sort]
+        if lucene_sort is not None:
+            grouping.setGroupSort(lucene_sort)
+            grouping.setSortWithinGroup(lucene_sort)
+        grouping.setGroupDocsLimit(per_group)
+        grouping.setCachingInMB(GROUPING_CACHE_MB, True)
+        grouping.setAllGroups(True)
+        return grouping.search(searcher, query, 0, max_groups)
+    
+    def _group_page(self, searcher, top_groups, fields):
+        groups = []
+        for group in top_groups.groups:
+            key = BytesRef.cast_(group.groupValue()).utf8ToString()
+            groups.append(SearchGroup(self._load_results(searcher, group.scoreDocs(), fields), key,
+                                      group.totalHits().value()))
+        return SearchPage([group[0] for group in groups if group], top_groups.totalHitCount,
+                          groups=groups, total_groups=top_groups.totalGroupCount)
+    
+    def field_scores(self, query_text, depth=200):
+        """Unboosted per-field scores of the top depth candidates of every SEARCH_FIELDS field
+        
+        Returns ({doc: [score per SEARCH_FIELDS field]}, {doc: name}). The boosted
+        multi-field query scores a doc as the boost-weighted sum of these, so
+        boost configurations can be compared without searching again.
+        Filter-only queries give their first depth matches with all-zero scores.
+        """
+        clean_query, filters = self.parse_query(query_text)
+        scores = {}
+        
+        with self.acquire() as searcher:
+            if clean_query:
+                for column, field in enumerate(SEARCH_FIELDS):
+                    hits = searcher.search(self.compile_query(clean_query, filters, field=field), depth)
+                    for hit in hits.scoreDocs:
+                        scores.setdefault(hit.doc, [0.0] * len(SEARCH_FIELDS))[column] = hit.score
+            else:
+                query = self.compile_query(clean_query, filters)
+                if query is not None:
+                    for hit in searcher.search(query, depth).scoreDocs:
+                        scores[hit.doc] = [0.0] * len(SEARCH_FIELDS)
+            
+            names, field_set = self._projection(('name',))
+            stored = searcher.storedFields()
+            doc_names = {doc: stored.document(doc, field_set).get('name') for doc in scores}
+        
+        return scores, doc_names
+    
+    def similar(self, key, n=10, fields='display'):
+        """Pieces similar to the one with doc_id key (its url, or 'wiki:<title>')
+        
+        Builds a MoreLikeThis query from the piece's most distinctive terms in
+        SIMILAR_FIELDS, read from term vectors when the index has them.
+        Pages are cached per source piece and index generation.
+        Raises KeyError if there is no piece with that key.
+        """
+        if not isinstance(fields, str):
+            fields = tuple(fields)
+        cache_key = (key, n, fields)
+        
+        with self.acquire() as searcher:
+            generation = self.generation(searcher)
+            if self.similar_cache is not None:
+                cached = self.similar_cache.get(cache_key, generation)
+                if cached is not None:
+                    return cached.copy()
+            
+            source = TermQuery(Term('doc_id', key))
+            hits = searcher.search(source, 1).scoreDocs
+            if len(hits) == 0:
+                raise KeyError(key)
+            
+            mlt = MoreLikeThis(searcher.getIndexReader())
+            mlt.setFieldNames(SIMILAR_FIELDS)
+            # Fallback for fields without term vectors: re-analyze their stored text
+            mlt.setAnalyzer(self.analyzer)
+            mlt.setMinTermFreq(1)
+            mlt.setMinDocFreq(2)
+            mlt.setMaxQueryTerms(25)
+            mlt.setBoost(True)
+            
+            builder = BooleanQuery.Builder()
+            builder.add(mlt.like(hits[0].doc), BooleanClause.Occur.SHOULD)
+            builder.add(source, BooleanClause.Occur.MUST_NOT)
+            similar = searcher.search(builder.build(), n)
+            results = SearchPage(self._load_results(searcher, similar.scoreDocs, fields), similar.totalHits.value())
+        
+        if self.similar_cache is not None:
+            self.similar_cache.put(cache_key, generation, results)
+        return results.copy()
+    
+    def _vector_model(self):
+        """The index's VectorModel, reloaded when the indexer replaced it; None without vectors"""
+        path = model_path(self.active_dir)
+        try:
+            key = (path, os.path.getmtime(path))
+        except OSError:
+            return None
+        with self._vector_lock:
+            if self._vector_state is None or self._vector_state[0] != key:
+                self._vector_state = (key, VectorModel.load(path))
+            return self._vector_state[1]
+    
+    def semantic_search(self, query_text, max_results=10, fields='full', hybrid=False, vector_weight=VECTOR_WEIGHT):
+        """k-NN search over the document vectors, or hybrid keyword + vector ranking
+        
+        The query text is encoded with the index's TF-IDF/LSA model, so
+        spelling variants like "Fantasy"/"Fantasia" land close together.
+        year: and difficulty: filters restrict the HNSW graph search itself.
+        With hybrid=True the BM25 multi-field score and vector_weight times
+        the vector score are summed. Raises ValueError if the index was built
+        without vectors.
+        """
+        model = self._vector_model()
+        if model is None:
+            raise ValueError("the index has no document vectors, rebuild it with vectors=True")
+        
+        clean_query, filters = self.parse_query(query_text)
+        filter_query = self.compile_query('', filters)
+        vector = model.encode_text(clean_query) if clean_query else None
+        
+        builder = BooleanQuery.Builder()
+        if vector is not None:
+            target = JArray('float')(vector.tolist())
+            candidates = max(KNN_CANDIDATES, max_results)
+            if filter_query is None:
+                knn_query = KnnFloatVectorQuery(KNN_FIELD, target, candidates)
+            else:
+                knn_query = KnnFloatVectorQuery(KNN_FIELD, target, candidates, filter_query)
+            builder.add(BoostQuery(knn_query, float(vector_weight)) if hybrid else knn_query, BooleanClause.Occur.SHOULD)
+        if hybrid and clean_query:
+            builder.add(MultiFieldQueryParser.parse(self._parser(), clean_query), BooleanClause.Occur.SHOULD)
+        query = builder.build()
+        if query.clauses().size() == 0:
+            return SearchPage()
+        if filter_query is not None:
+            builder.add(filter_query, BooleanClause.Occur.FILTER)
+            query = builder.build()
+        
+        with self.acquire() as searcher:
+            hits = searcher.search(query, max_results)
+            return SearchPage(self._load_results(searcher, hits.scoreDocs, fields), hits.totalHits.value())
+    
+    def _current_suggester(self):
+        """The open TypeAheadSuggester, opened on first use; None if none was built"""
+        suggester = self._suggester
+        if suggester is None:
+            with self._suggest_lock:
+                if self._suggester is None:
+                    try:
+                        self._suggester = TypeAheadSuggester(self.active_dir)
+                    except FileNotFoundError:
+                        return None
+                suggester = self._suggester
+        return suggester
+    
+    def suggest(self, prefix, n=10):
+        """Type-ahead completions of prefix from names, composers, titles and catalogue numbers
+        
+        year: and difficulty: filters in prefix restrict the suggestions to
+        texts of matching pieces (years by whole decades). Returns up to n
+        dicts (text, field, weight), empty if no suggester was built.
+        """
+        clean_prefix, filters = self.parse_query(prefix)
+        if not clean_prefix:
+            return []
+        difficulties = None
+        if filters['difficulty']:
+            difficulties = [name for name, levels in DIFFICULTY_RANGES.items() if levels == filters['difficulty']]
+        contexts = filter_contexts(filters['year_range'], difficulties)
+        
+        suggester = self._current_suggester()
+        if suggester is None:
             return []
+        try:
+            return suggester.lookup(clean_prefix, n, contexts)
+        except lucene.JavaError:
+            # Closed under us by maybe_refresh, retry on the new version
+            if suggester is self._suggester:
+                raise
+            suggester = self._current_suggester()
+            return suggester.lookup(clean_prefix, n, contexts) if suggester is not None else []
+    
+    def _facet_reader_state(self, searcher):
+        """Facet ordinal state of the searcher's reader, rebuilt once per index generation"""
+        generation = self.generation(searcher)
+        with self._facet_lock:
+            if self._facet_state is None or self._facet_state[0] != generation:
+                state = DefaultSortedSetDocValuesReaderState(searcher.getIndexReader(), FacetsConfig())
+                self._facet_state = (generation, state)
+            return self._facet_state[1]
+    
+    def faceted_search(self, query_text, dims=FACET_DIMS, top_n=10, max_results=10, fields='display'):
+        """Top hits plus top_n facet counts per dimension, collected in one pass
+        
+        Accepts the same text and filter syntax as multi_field_search; an empty
+        query counts over the whole index. Counts are on the returned page's
+        facets as {dim: [(label, count), ...]}.
+        """
+        clean_query, filters = self.parse_query(query_text)
         
-        hits = self.searcher.search(final_query, max_results)
-        
-        results = []
-        for hit in hits.scoreDocs:
-            doc = self.searcher.storedFields().document(hit.doc)
-            results.append({
-                'score': hit.score,
-                'name': doc.get('name'),
-                'composer': doc.get('composer'),
-                'key': doc.get('key'),
-                'year': doc.get('year'),
-                'level': doc.get('level'),
-                'period': doc.get('period'),
-                'url': doc.get('url'),
-                'wiki_title': doc.get('wiki_title'),
-                'info_composer': doc.get('info_composer'),
-                'info_key': doc.get('info_key'),
-                'info_catalogue': doc.get('info_catalogue'),
-                'info_opus': doc.get('info_opus'),
-                'info_form': doc.get('info_form'),
-                'info_genre': doc.get('info_genre'),
-                'info_composed': doc.get('info_composed')
-            })
-        
-        return results
+        with self.acquire() as searcher:
+            query = self.compile_query(clean_query, filters) or MatchAllDocsQuery()
+            # Doc values counting sees every match without materializing hits
+            collected = FacetsCollectorManager.search(searcher, query, max_results, FacetsCollectorManager())
+            counts = SortedSetDocValuesFacetCounts(self._facet_reader_state(searcher), collected.facetsCollector())
+            
+            facets = {}
+            for dim in dims:
+                top = counts.getTopChildren(top_n, dim)
+                facets[dim] = [] if top is None else [(entry.label, entry.value.intValue()) for entry in top.labelValues]
+            
+            hits = collected.topDocs()
+            return SearchPage(self._load_results(searcher, hits.scoreDocs, fields), hits.totalHits.value(),
+                              facets=facets)
     
     def close(self):
-        self.reader.close()
\ No newline at end of file
+        self._closed.set()
+        if self._refresher is not None:
+            self._refresher.join()
+        self.manager.close()
+        if self._executor is not None:
+            self._executor.shutdown()
+        if self._suggester is not None:
+            self._suggester.close()
+        if self.query_log is not None:
+            self.query_log.close()
\ No newline at end of file
@@ -0,0 +1,312 @@
+"""
+HTTP/JSON search service for PyLucene Music Search Engine
+Serves multi_field_search and the filter syntax to many clients at once
+"""
+import lucene
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from searcher import MusicSearcher, PROJECTIONS, SORTS, FACET_DIMS, GROUP_FIELDS
+
+MAX_BODY_BYTES = 64 * 1024
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    503: 'Service Unavailable',
+    504: 'Gateway Timeout'
+}
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class SearchServer:
+    """asyncio HTTP front end, searches run on a bounded pool of JVM-attached threads
+
+    All requests share the one MusicSearcher (and its IndexSearcher). At most
+    max_pending searches may be queued or running, further requests get a 503;
+    a search that takes longer than timeout seconds is answered with a 504.
+    """
+
+    def __init__(self, searcher, host='127.0.0.1', port=8080, workers=4, max_pending=64, timeout=5.0):
+        self.searcher = searcher
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self._pool = None
+        self._server = None
+
+    async def start(self):
+        """Start listening, port=0 picks a free port (available as self.port afterwards)"""
+        env = lucene.getVMEnv()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, initializer=env.attachCurrentThread)
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"Serving music search on http://{self.host}:{self.port} ({self.workers} workers)")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        self._pool.shutdown(wait=True)
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                method, target, body = await asyncio.wait_for(self._read_request(reader), self.timeout)
+                status, payload = await self._route(method, target, body)
+            except RequestError as e:
+                status, payload = e.status, {'error': str(e)}
+            except asyncio.TimeoutError:
+                status, payload = 504, {'error': 'request timed out'}
+            except Exception as e:
+                status, payload = 500, {'error': str(e)}
+
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            head = (f"HTTP/1.1 {status} {REASONS.get(status, 'Internal Server Error')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: close\r\n")
+            if status == 503:
+                head += "Retry-After: 1\r\n"
+            writer.write(head.encode('ascii') + b"\r\n" + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) != 3:
+            raise RequestError(400, "malformed request line")
+        method, target, _ = request_line
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length') or 0)
+        if length > MAX_BODY_BYTES:
+            raise RequestError(413, "request body too large")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, body
+
+    async def _route(self, method, target, body):
+        url = urlsplit(target)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if method == 'POST':
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError:
+                raise RequestError(400, "body is not valid JSON")
+            if not isinstance(payload, dict):
+                raise RequestError(400, "body must be a JSON object")
+            params.update(payload)
+        elif method != 'GET':
+            raise RequestError(405, f"method {method} not allowed")
+
+        if url.path == '/health':
+            return 200, {'status': 'ok', 'pending': self.pending, 'cache': self.searcher.cache_stats()}
+
+        if url.path == '/similar':
+            key = params.get('id')
+            if not isinstance(key, str) or not key:
+                raise RequestError(400, "missing piece parameter 'id' (a doc_id from search results)")
+            try:
+                n = int(params.get('n', 10))
+            except (TypeError, ValueError):
+                raise RequestError(400, "n must be an integer")
+            fields = self._fields(params.get('fields', 'display'))
+            try:
+                results = await self._submit(self.searcher.similar, key, n=max(1, min(n, 100)), fields=fields)
+            except KeyError:
+                raise RequestError(404, f"no piece with id {key}")
+            return 200, {
+                'id': key,
+                'count': len(results),
+                'results': [result.to_dict() for result in results]
+            }
+        
+        query = params.get('q', params.get('query'))
+        
+        if url.path == '/facets':
+            # An empty query counts facets over the whole index
+            query = query if isinstance(query, str) else ''
+            try:
+                top_n = int(params.get('top_n', 10))
+                max_results = int(params.get('max_results', 10))
+            except (TypeError, ValueError):
+                raise RequestError(400, "top_n and max_results must be integers")
+            if not 1 <= top_n <= 1000 or not 1 <= max_results <= 1000:
+                raise RequestError(400, "top_n and max_results must be between 1 and 1000")
+            dims = params.get('dims', ','.join(FACET_DIMS))
+            dims = dims.split(',') if isinstance(dims, str) else dims
+            if not isinstance(dims, list) or not set(dims) <= set(FACET_DIMS):
+                raise RequestError(400, f"dims must be a subset of {', '.join(FACET_DIMS)}")
+            results = await self._submit(self.searcher.faceted_search, query, dims=dims, top_n=top_n,
+                                         max_results=max_results)
+            return 200, {
+                'query': query,
+                'total_hits': results.total_hits,
+                'facets': {dim: [{'label': label, 'count': count} for label, count in entries]
+                           for dim, entries in results.facets.items()},
+                'results': [result.to_dict() for result in results]
+            }
+        
+        if not isinstance(query, str) or not query.strip():
+            raise RequestError(400, "missing query parameter 'q'")
+
+        if url.path == '/suggest':
+            try:
+                n = int(params.get('n', 10))
+            except (TypeError, ValueError):
+                raise RequestError(400, "n must be an integer")
+            # On a worker too: the first lookup after a rebuild opens the suggester from disk
+            suggestions = await self._submit(self.searcher.suggest, query, n=max(1, min(n, 50)))
+            return 200, {'query': query, 'suggestions': suggestions}
+        
+        if url.path == '/parse':
+            clean_query, filters = self.searcher.parse_query(query)
+            return 200, {'query': clean_query, 'filters': filters}
+
+        if url.path == '/search':
+            try:
+                max_results = int(params.get('max_results', 10))
+            except (TypeError, ValueError):
+                raise RequestError(400, "max_results must be an integer")
+            if not 1 <= max_results <= 1000:
+                raise RequestError(400, "max_results must be between 1 and 1000")
+            fields = self._fields(params.get('fields', 'display'))
+            sort = params.get('sort', 'relevance')
+            if sort not in SORTS:
+                raise RequestError(400, f"sort must be one of {', '.join(SORTS)}")
+            mode = params.get('mode', 'keyword')
+            if mode not in ('keyword', 'semantic', 'hybrid'):
+                raise RequestError(400, "mode must be one of keyword, semantic, hybrid")
+            if mode != 'keyword':
+                try:
+                    results = await self._submit(self.searcher.semantic_search, query, max_results=max_results,
+                                                 fields=fields, hybrid=mode == 'hybrid')
+                except ValueError as e:
+                    raise RequestError(400, str(e))
+                return 200, {
+                    'query': query,
+                    'mode': mode,
+                    'count': len(results),
+                    'total_hits': results.total_hits,
+                    'results': [result.to_dict() for result in results]
+                }
+            profile = str(params.get('profile', '')).lower() in ('1', 'true', 'yes')
+            exact_total = str(params.get('exact_total', '')).lower() in ('1', 'true', 'yes')
+            try:
+                explain = max(0, min(int(params.get('explain', 0)), 10))
+            except (TypeError, ValueError):
+                raise RequestError(400, "explain must be an integer")
+            group_by = params.get('group_by') or None
+            if group_by is not None and group_by not in GROUP_FIELDS:
+                raise RequestError(400, f"group_by must be one of {', '.join(GROUP_FIELDS)}")
+            try:
+                per_group = int(params.get('per_group', 3))
+            except (TypeError, ValueError):
+                raise RequestError(400, "per_group must be an integer")
+            if not 1 <= per_group <= 100:
+                raise RequestError(400, "per_group must be between 1 and 100")
+            try:
+                results = await self._submit(self.searcher.multi_field_search, query, max_results=max_results,
+                                             fields=fields, sort=sort, after=params.get('cursor'),
+                                             profile=profile, explain=explain, group_by=group_by,
+                                             per_group=per_group, exact_total=exact_total)
+            except ValueError as e:
+                raise RequestError(400, str(e))
+            response = {
+                'query': query,
+                'count': len(results),
+                'total_hits': results.total_hits,
+                'exact_total': results.exact_total,
+                'next_cursor': results.next_cursor,
+                'results': [result.to_dict() for result in results]
+            }
+            if group_by is not None:
+                # results hold the best hit of each group, groups all returned hits
+                response['total_groups'] = results.total_groups
+                response['groups'] = [group.to_dict() for group in results.groups]
+            if profile or explain:
+                response['profile'] = results.profile
+            return 200, response
+
+        raise RequestError(404, f"unknown endpoint {url.path}")
+
+    def _fields(self, fields):
+        """Projection preset name, or field names as a list or comma-separated string"""
+        if isinstance(fields, str):
+            if fields in PROJECTIONS:
+                return fields
+            fields = fields.split(',')
+        if not isinstance(fields, list) or not all(isinstance(name, str) and name for name in fields):
+            raise RequestError(400, "fields must be a projection preset or a list of field names")
+        return tuple(name.strip() for name in fields)
+
+    async def _submit(self, fn, *args, **kwargs):
+        """Run fn on the worker pool with backpressure and a timeout"""
+        if self.pending >= self.max_pending:
+            raise RequestError(503, "too many pending searches")
+
+        loop = asyncio.get_running_loop()
+        future = self._pool.submit(fn, *args, **kwargs)
+        self.pending += 1
+        # A timed-out search keeps its slot until the worker is really done
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise RequestError(504, f"search took longer than {self.timeout}s")
+
+    def _release(self):
+        self.pending -= 1
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP/JSON music search service")
+    parser.add_argument('--index', default="/data/music_index")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=4, help="search worker threads")
+    parser.add_argument('--max-pending', type=int, default=64, help="queued searches before answering 503")
+    parser.add_argument('--timeout', type=float, default=5.0, help="per-request timeout in seconds")
+    parser.add_argument('--refresh-interval', type=float, default=5.0, help="seconds between index refresh checks")
+    parser.add_argument('--query-log', default=None, help="append profiled queries to this rotating JSONL file")
+    args = parser.parse_args()
+
+    if not lucene.getVMEnv():
+        lucene.initVM()
+
+    searcher = MusicSearcher(args.index, refresh_interval=args.refresh_interval, query_log=args.query_log)
+    server = SearchServer(searcher, host=args.host, port=args.port, workers=args.workers,
+                          max_pending=args.max_pending, timeout=args.timeout)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        searcher.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+PyLucene Music Search Engine - Type-ahead suggestions
+Infix suggester over piece names, composers, Wikipedia titles and catalogue numbers,
+stored in the suggest/ subdirectory of the main index
+"""
+import lucene
+import json
+import os
+import re
+import shutil
+from org.apache.lucene.analysis.standard import StandardAnalyzer
+from org.apache.lucene.search.suggest.analyzing import AnalyzingInfixSuggester
+from org.apache.lucene.store import FSDirectory
+from org.apache.lucene.util import BytesRef
+from java.nio.file import Paths
+from java.util import HashSet
+
+# Fields that feed the suggester, earlier fields win when two share a text
+SUGGEST_FIELDS = ('name', 'composer', 'wiki_title', 'info_catalogue')
+
+# Shortest prefix answered from the edge n-gram field
+MIN_PREFIX_CHARS = 2
+
+MANIFEST = 'manifest.json'
+
+# Small file next to the manifest with only its version and entry count, polled by searchers
+VERSION_FILE = 'version.json'
+
+def suggest_dir(index_dir):
+    return os.path.join(index_dir, 'suggest')
+
+def decade(year):
+    return year // 10 * 10
+
+def row_contexts(year, difficulty):
+    """Context labels of one piece: its decade, its difficulty bucket and both combined"""
+    contexts = set()
+    if year is not None:
+        contexts.add(f"y:{decade(year)}")
+    if difficulty:
+        contexts.add(f"d:{difficulty}")
+    if year is not None and difficulty:
+        contexts.add(f"d:{difficulty}|y:{decade(year)}")
+    return contexts
+
+def filter_contexts(year_range, difficulties):
+    """Contexts a suggestion needs one of to satisfy the filters, None for no filter
+
+    A year range is widened to whole decades, so the year filter is approximate.
+    """
+    decades = None
+    if year_range:
+        start_year, end_year = year_range
+        decades = range(decade(start_year), decade(end_year) + 1, 10)
+    if decades is not None and difficulties:
+        return {f"d:{bucket}|y:{year}" for bucket in difficulties for year in decades}
+    if decades is not None:
+        return {f"y:{year}" for year in decades}
+    if difficulties:
+        return {f"d:{bucket}" for bucket in difficulties}
+    return None
+
+def collect_suggestions(rows, level_bucket):
+    """Aggregate CSV rows to text -> [field, weight, sorted contexts]
+
+    The weight of a text is the number of pieces it occurs in, its contexts
+    the union over those pieces. Catalogue values without a digit ("Hob.")
+    are not worth suggesting and are skipped.
+    """
+    entries = {}
+    for row in rows:
+        year = (row.get('year') or '').strip()
+        contexts = row_contexts(int(year) if year.isdigit() else None, level_bucket(row.get('level')))
+        seen = set()
+        for field in SUGGEST_FIELDS:
+            text = ' '.join((row.get(field) or '').split())
+            if not text or text in seen:
+                continue
+            if field == 'info_catalogue' and not re.search(r'\d', text):
+                continue
+            seen.add(text)
+            entry = entries.setdefault(text, [field, 0, set()])
+            entry[1] += 1
+            entry[2] |= contexts
+    return {text: [field, weight, sorted(contexts)] for text, (field, weight, contexts) in entries.items()}
+
+def read_manifest(path):
+    """Manifest of a built suggester ({'version': n, 'entries': {...}}), None if there is none"""
+    manifest_path = os.path.join(path, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def read_version(path):
+    """{'version': n, 'entries': count} of a built suggester, None if there is none
+
+    Cheap to call on every refresh, unlike read_manifest which loads all texts.
+    """
+    version_path = os.path.join(path, VERSION_FILE)
+    if not os.path.exists(version_path):
+        # Built before the version file existed
+        manifest = read_manifest(path)
+        if manifest is None:
+            return None
+        return {'version': manifest['version'], 'entries': len(manifest['entries'])}
+    with open(version_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def open_infix_suggester(path):
+    analyzer = StandardAnalyzer()
+    return AnalyzingInfixSuggester(FSDirectory.open(Paths.get(path)), analyzer, analyzer, MIN_PREFIX_CHARS,
+                                   False, True, False)
+
+def write_entries(suggester, entries, update=False):
+    for text, (field, weight, contexts) in entries.items():
+        context_set = HashSet()
+        for context in contexts:
+            context_set.add(BytesRef(context))
+        if update:
+            suggester.update(text, context_set, weight, BytesRef(field))
+        else:
+            suggester.add(text, context_set, weight, BytesRef(field))
+
+def build_suggester(index_dir, entries, incremental=False):
+    """Write the suggester for entries (see collect_suggestions) next to the index
+
+    Incrementally only new and changed texts are updated in place. Texts that
+    disappeared cannot be deleted from the suggester, so then (and without an
+    earlier build) it is rebuilt into a fresh directory that replaces the old one.
+    Returns the number of texts written.
+    """
+    if not lucene.getVMEnv():
+        lucene.initVM()
+    path = suggest_dir(index_dir)
+    manifest = read_manifest(path) if incremental else None
+
+    if manifest is not None and set(manifest['entries']) <= set(entries):
+        old = manifest['entries']
+        changed = {text: entry for text, entry in entries.items() if old.get(text) != entry}
+        if changed:
+            suggester = open_infix_suggester(path)
+            try:
+                write_entries(suggester, changed, update=True)
+                suggester.commit()
+            finally:
+                suggester.close()
+        version = manifest['version'] + (1 if changed else 0)
+        written = len(changed)
+    else:
+        build_path = path + '.new'
+        shutil.rmtree(build_path, ignore_errors=True)
+        os.makedirs(build_path)
+        if entries:
+            suggester = open_infix_suggester(build_path)
+            try:
+                write_entries(suggester, entries)
+                suggester.commit()
+            finally:
+                suggester.close()
+        old = read_version(path)
+        version = (old['version'] + 1) if old else 1
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(build_path, path)
+        written = len(entries)
+
+    with open(os.path.join(path, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump({'version': version, 'entries': entries}, f, ensure_ascii=False)
+    # Written last: searchers reopen the suggester when its version changes
+    with open(os.path.join(path, VERSION_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'version': version, 'entries': len(entries)}, f)
+    return written
+
+class TypeAheadSuggester:
+    """Read-only view of a built suggester, safe to share between threads"""
+
+    def __init__(self, index_dir):
+        path = suggest_dir(index_dir)
+        version = read_version(path)
+        if version is None:
+            raise FileNotFoundError(f"no suggester built in {path}")
+        self.version = version['version']
+        # Nothing was written for an empty corpus, there is no index to open
+        self._suggester = open_infix_suggester(path) if version['entries'] else None
+
+    def lookup(self, prefix, n=10, contexts=None):
+        """Up to n completions of prefix as dicts (text, field, weight), heaviest first
+
+        contexts (see filter_contexts) keeps only texts that occur in one of them.
+        """
+        if self._suggester is None:
+            return []
+        context_set = None
+        if contexts is not None:
+            context_set = HashSet()
+            for context in contexts:
+                context_set.add(BytesRef(context))
+        results = self._suggester.lookup(prefix, context_set, n, True, False)
+        return [{
+            'text': result.key.toString(),
+            'field': result.payload.utf8ToString(),
+            'weight': result.value
+        } for result in results]
+
+    def close(self):
+        if self._suggester is not None:
+            self._suggester.close()
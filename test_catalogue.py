@@ -0,0 +1,37 @@
+"""
+Tests for catalogue-number extraction and catalogue-shaped query detection
+"""
+from catalogue import catalogue_ids, opus_ids, catalogue_query
+
+def test_catalogue_ids_from_names():
+    assert catalogue_ids('Nocturne 2 in E-flat Major, Op. 9 No. 2') == ['op 9 no 2', 'op 9']
+    assert catalogue_ids('Turkish March (Rondo Alla Turca) in A Minor, K. 331') == ['k 331']
+    assert catalogue_ids('Paganini Etude: Vivo (Arpeggio) in E Major, S . 141 No. 4') == ['s 141 no 4', 's 141']
+    assert catalogue_ids('Moment Musical in F Minor, Op. 94 D. 780 No. 3') == ['op 94', 'd 780 no 3', 'd 780']
+    assert catalogue_ids('Grande Sonate - for four hands in B-flat Major, Op. 30 D. 617') == ['op 30', 'd 617']
+
+def test_catalogue_ids_ignore_keys_and_books():
+    assert catalogue_ids('Sonata in D Major') == []
+    assert catalogue_ids('Book 2 from Sonatas, K. 15 m') == ['k 15']
+
+def test_opus_ids_of_bare_numbers():
+    assert opus_ids('25') == ['op 25']
+    assert opus_ids('10, No. 1') == ['op 10 no 1', 'op 10']
+    assert opus_ids('WoO 81') == ['woo 81']
+    assert opus_ids('Köchel catalogue') == []
+
+def test_catalogue_query_shapes():
+    assert catalogue_query('bwv 846') == ['bwv 846']
+    assert catalogue_query('BWV846') == ['bwv 846']
+    assert catalogue_query('Op. 10 No. 1') == ['op 10 no 1']
+    assert catalogue_query('op 10/1') == ['op 10 no 1']
+    assert catalogue_query('K545, K. 331') == ['k 545', 'k 331']
+    assert catalogue_query('Hob. XVI: 52') == ['hob xvi:52']
+
+def test_catalogue_query_keeps_sub_numbers_of_every_scheme():
+    assert catalogue_query('S. 141 No. 5') == ['s 141 no 5']
+    assert catalogue_query('D. 780 No. 3') == ['d 780 no 3']
+
+def test_catalogue_query_rejects_mixed_text():
+    assert catalogue_query('chopin op 10') is None
+    assert catalogue_query('nocturne') is None
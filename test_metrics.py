@@ -1,62 +1,136 @@
 import json
-from searcher import MusicSearcher
-from sklearn.metrics import precision_score, recall_score, f1_score
+import numpy as np
 
-def evaluate_searcher(index_dir, queries_file):
-    """Evaluate the searcher using precision, recall, and F1 metrics."""
-    index_dir = "/data/music_index"  # Update with the correct path
-    queries_file = "/data/queries.json"  # Update with the correct path
-
-    # Load queries and expected results
+def load_queries(queries_file):
+    """Load [(query, expected result names)] from queries.json"""
     with open(queries_file, 'r') as f:
         data = json.load(f)
-
-    searcher = MusicSearcher(index_dir)
-
-    queries = data['queries']
+    return [(query_data['query'], query_data['expected_results']) for query_data in data['queries']]
+
+def relevance_matrix(retrieved, expected, k):
+    """0/1 matrix (queries x k) marking relevant hits by rank, plus relevant counts per query
+
+    An expected name counts once: later hits with the same name (the CSV has
+    duplicate names) are not relevant again.
+    """
+    relevance = np.zeros((len(retrieved), k))
+    for i, (names, relevant) in enumerate(zip(retrieved, expected)):
+        relevant = set(relevant)
+        for rank, name in enumerate(names[:k]):
+            if name in relevant:
+                relevance[i, rank] = 1.0
+                relevant.discard(name)
+    num_relevant = np.array([len(set(relevant)) for relevant in expected], dtype=float)
+    return relevance, num_relevant
+
+def ranking_metrics(relevance, num_relevant, num_retrieved):
+    """Per-query metrics, each an array over queries
+
+    precision/recall/f1 are set-based over the retrieved list (as before);
+    p_at_k, ap, ndcg and rr are rank-aware at cutoff k = relevance.shape[1].
+    """
+    k = relevance.shape[1]
+    ranks = np.arange(1, k + 1)
+    hits = relevance.sum(axis=1)
+    safe_relevant = np.maximum(num_relevant, 1)
+
+    precision = np.divide(hits, num_retrieved, out=np.zeros_like(hits), where=num_retrieved > 0)
+    recall = hits / safe_relevant
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros_like(hits), where=(precision + recall) > 0)
+
+    # Average precision: precision at every relevant rank, normalized by the reachable maximum
+    precision_at_rank = np.cumsum(relevance, axis=1) / ranks
+    ideal_hits = np.minimum(num_relevant, k)
+    ap = np.divide((precision_at_rank * relevance).sum(axis=1), ideal_hits,
+                   out=np.zeros_like(hits), where=ideal_hits > 0)
+
+    # nDCG with binary gains
+    discounts = 1.0 / np.log2(ranks + 1)
+    dcg = relevance @ discounts
+    ideal_dcg = np.concatenate(([0.0], np.cumsum(discounts)))[ideal_hits.astype(int)]
+    ndcg = np.divide(dcg, ideal_dcg, out=np.zeros_like(hits), where=ideal_dcg > 0)
+
+    # Reciprocal rank of the first relevant hit
+    first = relevance.argmax(axis=1)
+    rr = np.where(hits > 0, 1.0 / (first + 1), 0.0)
+
+    return {
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'p_at_k': hits / k,
+        'ap': ap,
+        'ndcg': ndcg,
+        'rr': rr
+    }
+
+def evaluate(searcher, queries, k=10, workers=4, boosts=None):
+    """Run all queries concurrently over one searcher, returns per-query and mean metrics"""
+    # Profiled for the per-query latency, measured inside the search call
+    runs = searcher.search_many((query for query, _ in queries), max_results=k, workers=workers, boosts=boosts,
+                                profile=True)
+
+    retrieved, latencies = [], []
+    for _, results in runs:
+        retrieved.append([result['name'] for result in results if result.get('name')])
+        latencies.append(results.profile['timings']['total_ms'])
+    latencies = np.array(latencies)
+    relevance, num_relevant = relevance_matrix(retrieved, [expected for _, expected in queries], k)
+    num_retrieved = np.array([min(len(names), k) for names in retrieved], dtype=float)
+    metrics = ranking_metrics(relevance, num_relevant, num_retrieved)
+
+    per_query = []
+    for i, (query, _) in enumerate(queries):
+        entry = {name: float(values[i]) for name, values in metrics.items()}
+        entry['query'] = query
+        entry['latency_ms'] = float(latencies[i])
+        per_query.append(entry)
+
+    mean = {name: float(values.mean()) for name, values in metrics.items()}
+    mean['map'] = mean.pop('ap')
+    mean['mrr'] = mean.pop('rr')
+    mean['latency_p50_ms'] = float(np.percentile(latencies, 50))
+    mean['latency_p95_ms'] = float(np.percentile(latencies, 95))
+    return {'k': k, 'boosts': boosts, 'per_query': per_query, 'mean': mean}
+
+def evaluate_searcher(index_dir, queries_file, k=10, workers=4, boosts=None, searcher=None):
+    """Evaluate the searcher with set-based and ranking metrics plus per-query latency
+
+    Pass an open searcher to reuse it (and its JVM) instead of opening index_dir.
+    """
+    queries = load_queries(queries_file)
+
+    own_searcher = searcher is None
+    if own_searcher:
+        # Imported here, so the metrics above can be used (and tested) without a JVM
+        import lucene
+        from searcher import MusicSearcher
+        if not lucene.getVMEnv():
+            lucene.initVM()
+        # Result cache off so latencies are real searches
+        searcher = MusicSearcher(index_dir, cache_size=0)
 
     try:
-        all_precisions = []
-        all_recalls = []
-        all_f1s = []
-
-        for query_data in queries:
-            query = query_data['query']
-            expected_results = query_data['expected_results']
-
-            # Perform search
-            results = searcher.multi_field_search(query, max_results=10)
-            retrieved_results = [result['name'] for result in results if result.get('name')]
-
-            # Compute metrics
-            y_true = [1 if result in expected_results else 0 for result in retrieved_results]
-            y_pred = [1] * len(retrieved_results)
-
-            precision = precision_score(y_true, y_pred, zero_division=0)
-            recall = recall_score(y_true, y_pred, zero_division=0)
-            f1 = f1_score(y_true, y_pred, zero_division=0)
-
-            all_precisions.append(precision)
-            all_recalls.append(recall)
-            all_f1s.append(f1)
-
-            print(f"Query: {query}")
-            print(f"Precision: {precision:.2f}, Recall: {recall:.2f}, F1: {f1:.2f}\n")
+        report = evaluate(searcher, queries, k=k, workers=workers, boosts=boosts)
+    finally:
+        if own_searcher:
+            searcher.close()
 
-        # Compute average metrics
-        avg_precision = sum(all_precisions) / len(all_precisions)
-        avg_recall = sum(all_recalls) / len(all_recalls)
-        avg_f1 = sum(all_f1s) / len(all_f1s)
+    for entry in report['per_query']:
+        print(f"Query: {entry['query']}")
+        print(f"Precision: {entry['precision']:.2f}, Recall: {entry['recall']:.2f}, F1: {entry['f1']:.2f}, "
+              f"P@{k}: {entry['p_at_k']:.2f}, AP: {entry['ap']:.2f}, nDCG: {entry['ndcg']:.2f}, "
+              f"RR: {entry['rr']:.2f} ({entry['latency_ms']:.1f} ms)\n")
 
-        print("Overall Metrics:")
-        print(f"Average Precision: {avg_precision:.2f}")
-        print(f"Average Recall: {avg_recall:.2f}")
-        print(f"Average F1: {avg_f1:.2f}")
+    mean = report['mean']
+    print("Overall Metrics:")
+    print(f"Average Precision: {mean['precision']:.2f}")
+    print(f"Average Recall: {mean['recall']:.2f}")
+    print(f"Average F1: {mean['f1']:.2f}")
+    print(f"P@{k}: {mean['p_at_k']:.2f}, MAP: {mean['map']:.2f}, nDCG@{k}: {mean['ndcg']:.2f}, MRR: {mean['mrr']:.2f}")
+    print(f"Latency p50: {mean['latency_p50_ms']:.1f} ms, p95: {mean['latency_p95_ms']:.1f} ms")
 
-    finally:
-        searcher.close()
+    return report
 
 if __name__ == "__main__":
     evaluate_searcher("/data/music_index", "/data/queries.json")
-
-
@@ -0,0 +1,23 @@
+"""
+Tests for the ranking metrics of test_metrics (no JVM needed)
+"""
+import numpy as np
+import pytest
+from test_metrics import relevance_matrix, ranking_metrics
+
+def test_relevance_counts_duplicate_names_once():
+    relevance, num_relevant = relevance_matrix([['a', 'a']], [['a']], 2)
+    assert relevance.tolist() == [[1.0, 0.0]]
+    metrics = ranking_metrics(relevance, num_relevant, np.array([2.0]))
+    assert metrics['recall'][0] == 1.0
+    assert metrics['ap'][0] == 1.0
+    assert metrics['ndcg'][0] == pytest.approx(1.0)
+
+def test_ranking_metrics():
+    relevance, num_relevant = relevance_matrix([['x', 'a', 'b'], ['y', 'z']], [['a', 'b'], ['c']], 3)
+    metrics = ranking_metrics(relevance, num_relevant, np.array([3.0, 2.0]))
+    assert metrics['precision'].tolist() == pytest.approx([2 / 3, 0.0])
+    assert metrics['recall'].tolist() == [1.0, 0.0]
+    assert metrics['rr'].tolist() == [0.5, 0.0]
+    assert metrics['ap'][0] == pytest.approx((1 / 2 + 2 / 3) / 2)
+    assert 0.0 < metrics['ndcg'][0] < 1.0
@@ -0,0 +1,102 @@
+"""
+Tests for the HTTP/JSON search service over a tiny temporary index (skipped without lucene)
+"""
+import asyncio
+import csv
+import json
+import time
+import pytest
+
+lucene = pytest.importorskip('lucene')
+from indexer import create_index
+from searcher import MusicSearcher
+from server import SearchServer
+
+ROWS = [
+    {'url': 'https://example.org/1', 'name': 'Nocturne in E-flat Major, Op. 9 No. 2', 'composer': 'Frederic Chopin',
+     'year': '1832', 'level': '6'},
+    {'url': 'https://example.org/2', 'name': 'Prelude in C Major, BWV 846', 'composer': 'Johann Sebastian Bach',
+     'year': '1722', 'level': '4'},
+    {'url': 'https://example.org/3', 'name': 'Turkish March in A Minor, K. 331', 'composer': 'Wolfgang Amadeus Mozart',
+     'year': '1783', 'level': '5'},
+    {'url': 'https://example.org/4', 'name': 'Waltz in A Minor', 'composer': 'Frederic Chopin',
+     'year': '1843', 'level': '2'}
+]
+
+class SlowSearcher:
+    """Searcher whose multi_field_search takes at least delay seconds"""
+
+    def __init__(self, searcher, delay):
+        self.searcher = searcher
+        self.delay = delay
+
+    def multi_field_search(self, *args, **kwargs):
+        time.sleep(self.delay)
+        return self.searcher.multi_field_search(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.searcher, name)
+
+@pytest.fixture(scope='module')
+def searcher(tmp_path_factory):
+    if not lucene.getVMEnv():
+        lucene.initVM()
+    path = tmp_path_factory.mktemp('music')
+    csv_path = path / 'music.csv'
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(ROWS[0]))
+        writer.writeheader()
+        writer.writerows(ROWS)
+    create_index(str(csv_path), str(path / 'index'), suggest=False)
+    searcher = MusicSearcher(str(path / 'index'), cache_size=0)
+    yield searcher
+    searcher.close()
+
+async def request(port, target):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode('ascii'))
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    head, _, body = data.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+def serve(searcher, check, **options):
+    """Run check(port) against a SearchServer on a free port"""
+    async def run():
+        server = SearchServer(searcher, port=0, **options)
+        await server.start()
+        try:
+            return await check(server.port)
+        finally:
+            await server.stop()
+    return asyncio.run(run())
+
+def test_search(searcher):
+    status, payload = serve(searcher, lambda port: request(port, '/search?q=chopin&fields=id'))
+    assert status == 200
+    assert payload['total_hits'] == 2
+    assert {result['name'] for result in payload['results']} == {ROWS[0]['name'], ROWS[3]['name']}
+
+def test_search_with_filter(searcher):
+    status, payload = serve(searcher, lambda port: request(port, '/search?q=chopin%20difficulty:easy'))
+    assert status == 200
+    assert [result['name'] for result in payload['results']] == [ROWS[3]['name']]
+
+def test_bad_requests(searcher):
+    async def check(port):
+        return [await request(port, target) for target in
+                ('/search', '/search?q=bach&max_results=0', '/search?q=bach&sort=random', '/nowhere?q=bach')]
+    statuses = [status for status, _ in serve(searcher, check)]
+    assert statuses == [400, 400, 400, 404]
+
+def test_too_many_pending_searches(searcher):
+    async def check(port):
+        return await asyncio.gather(request(port, '/search?q=bach'), request(port, '/search?q=mozart'))
+    statuses = sorted(status for status, _ in serve(SlowSearcher(searcher, 0.5), check, max_pending=1))
+    assert statuses == [200, 503]
+
+def test_search_timeout(searcher):
+    status, payload = serve(SlowSearcher(searcher, 1.0), lambda port: request(port, '/search?q=bach'), timeout=0.2)
+    assert status == 504
+    assert 'error' in payload
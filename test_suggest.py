@@ -0,0 +1,18 @@
+"""
+Tests for suggester context labels (skipped without lucene)
+"""
+import pytest
+
+pytest.importorskip('lucene')
+from suggest import filter_contexts, row_contexts
+
+def test_row_contexts():
+    assert row_contexts(1847, 'hard') == {'y:1840', 'd:hard', 'd:hard|y:1840'}
+    assert row_contexts(None, 'easy') == {'d:easy'}
+    assert row_contexts(1847, None) == {'y:1840'}
+
+def test_filter_contexts():
+    assert filter_contexts(None, None) is None
+    assert filter_contexts((1841, 1859), None) == {'y:1840', 'y:1850'}
+    assert filter_contexts(None, ['easy']) == {'d:easy'}
+    assert filter_contexts((1850, 1850), ['easy', 'hard']) == {'d:easy|y:1850', 'd:hard|y:1850'}
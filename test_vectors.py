@@ -0,0 +1,36 @@
+"""
+Tests for the local TF-IDF/LSA document vector model
+"""
+import numpy as np
+import pytest
+from vectors import VectorModel, features
+
+def test_features_share_trigrams():
+    fantasy, fantasia = set(features('Fantasy')), set(features('Fantasia'))
+    assert 'w:fantasy' in fantasy
+    assert len(fantasy & fantasia) >= 5
+
+ROWS = [
+    {'name': 'Fantasia in D Minor', 'summary': 'a free fantasia for piano'},
+    {'name': 'Fantasy in C Major', 'summary': 'a fantasy with variations'},
+    {'name': 'Prelude and Fugue in C Major', 'summary': 'prelude and fugue from the well-tempered clavier'},
+    {'name': 'Prelude in E Minor', 'summary': 'a short prelude'},
+    {'name': 'Fugue in G Minor', 'summary': 'a fugue for organ'},
+    {'name': 'Waltz in A Minor', 'summary': 'a waltz for piano'},
+]
+
+def test_vector_model_ranks_similar_text_first():
+    model = VectorModel.fit(ROWS, dims=4, min_df=1)
+    query = model.encode_text('fantasie')
+    vectors = np.stack([model.encode_row(row) for row in ROWS])
+    assert np.linalg.norm(query) == pytest.approx(1.0, abs=1e-5)
+    assert set(np.argsort(-(vectors @ query))[:2]) == {0, 1}
+
+def test_vector_model_round_trip(tmp_path):
+    model = VectorModel.fit(ROWS, dims=4, min_df=1)
+    path = str(tmp_path / 'vectors.npz')
+    model.save(path)
+    loaded = VectorModel.load(path)
+    assert loaded.model_id == model.model_id
+    assert np.allclose(loaded.encode_text('waltz'), model.encode_text('waltz'))
+    assert model.encode_text('zzzz qqqq') is None
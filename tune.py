@@ -0,0 +1,182 @@
+"""
+Boost-weight tuning for PyLucene Music Search Engine
+Replays queries.json against many field boost configurations on one open index
+"""
+import lucene
+import argparse
+import itertools
+import json
+import os
+import time
+import numpy as np
+from searcher import MusicSearcher, SEARCH_FIELDS, FIELD_BOOSTS
+from test_metrics import load_queries, ranking_metrics, evaluate
+
+class CandidateScores:
+    """Per-field scores of one query's candidate docs, sorted by doc id (Lucene's tie-break)"""
+
+    def __init__(self, query, expected, scores, names):
+        self.query = query
+        self.docs = np.array(sorted(scores), dtype=np.int64)
+        self.scores = np.array([scores[doc] for doc in self.docs], dtype=np.float32).reshape(len(self.docs), len(SEARCH_FIELDS))
+        relevant = sorted(set(expected))
+        # Index of the expected name of each doc, -1 for irrelevant docs
+        name_ids = {name: i for i, name in enumerate(relevant)}
+        self.name_ids = np.array([name_ids.get(names.get(doc), -1) for doc in self.docs], dtype=np.int64)
+        self.num_relevant = len(relevant)
+
+    def relevance(self, boost_matrix, k):
+        """0/1 relevance of the top k for every configuration, shape (configs, k)"""
+        relevance = np.zeros((len(boost_matrix), k))
+        if len(self.docs):
+            totals = self.scores @ boost_matrix.T
+            # Stable sort keeps doc id order among equal scores, like Lucene
+            order = np.argsort(-totals, axis=0, kind='stable')[:k]
+            ids = self.name_ids[order]
+            # An expected name counts once per ranking, like test_metrics.relevance_matrix
+            earlier = np.tril(np.ones((len(ids), len(ids)), dtype=bool), -1)
+            repeated = ((ids[:, None, :] == ids[None, :, :]) & earlier[:, :, None]).any(axis=1)
+            relevance[:, :order.shape[0]] = ((ids >= 0) & ~repeated).T
+        return relevance
+
+def collect_candidates(searcher, queries, depth, cache_file=None):
+    """Per-field candidate scores for every query, reused from cache_file for the same index generation"""
+    with searcher.acquire() as index_searcher:
+        generation = searcher.generation(index_searcher)
+
+    cached = {}
+    if cache_file and os.path.exists(cache_file):
+        with open(cache_file, 'r') as f:
+            data = json.load(f)
+        if data.get('generation') == generation and data.get('depth') == depth and data.get('fields') == SEARCH_FIELDS:
+            cached = data['queries']
+            print(f"Reusing candidate scores from {cache_file}")
+
+    candidates = []
+    for query, expected in queries:
+        if query in cached:
+            entry = cached[query]
+            scores = {int(doc): values for doc, values in entry['scores'].items()}
+            names = {int(doc): name for doc, name in entry['names'].items()}
+        else:
+            scores, names = searcher.field_scores(query, depth=depth)
+            cached[query] = {'scores': scores, 'names': names}
+        candidates.append(CandidateScores(query, expected, scores, names))
+
+    if cache_file:
+        with open(cache_file, 'w') as f:
+            json.dump({'generation': generation, 'depth': depth, 'fields': SEARCH_FIELDS, 'queries': cached}, f)
+    return candidates
+
+def grid_configs(space):
+    """Every combination of the listed values, fields not in space keep their default boost"""
+    fields = [field for field in SEARCH_FIELDS if field in space]
+    for values in itertools.product(*(space[field] for field in fields)):
+        boosts = dict(FIELD_BOOSTS)
+        boosts.update(zip(fields, values))
+        yield boosts
+
+def random_configs(space, count, seed=42):
+    """count configurations sampled uniformly within each field's range
+
+    A field's range is min..max of its listed values, or 0..2x its default
+    boost if it is not in space.
+    """
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        boosts = {}
+        for field in SEARCH_FIELDS:
+            values = space.get(field) or [0.0, 2 * FIELD_BOOSTS.get(field, 1.0)]
+            boosts[field] = round(float(rng.uniform(min(values), max(values))), 2)
+        yield boosts
+
+def score_configs(candidates, configs, k):
+    """Mean ranking metrics of every configuration, computed from the cached candidate scores"""
+    boost_matrix = np.array([[boosts.get(field, 1.0) for field in SEARCH_FIELDS] for boosts in configs], dtype=np.float32)
+    # (queries, configs, k) -> one row per (query, config) pair
+    relevance = np.stack([candidate.relevance(boost_matrix, k) for candidate in candidates])
+    num_queries, num_configs, _ = relevance.shape
+    rows = relevance.reshape(num_queries * num_configs, k)
+    num_relevant = np.repeat([float(candidate.num_relevant) for candidate in candidates], num_configs)
+    num_retrieved = np.repeat([float(min(len(candidate.docs), k)) for candidate in candidates], num_configs)
+
+    metrics = ranking_metrics(rows, num_relevant, num_retrieved)
+    return {name: values.reshape(num_queries, num_configs).mean(axis=0) for name, values in metrics.items()}
+
+def tune(searcher, queries, configs, k=10, depth=200, top=10, cache_file=None):
+    """Rank boost configurations by mean nDCG@k, returns the best top entries"""
+    start = time.perf_counter()
+    candidates = collect_candidates(searcher, queries, depth, cache_file)
+    collected = time.perf_counter()
+
+    # The current defaults always take part as the baseline
+    configs = [dict(FIELD_BOOSTS)] + [boosts for boosts in configs if boosts != FIELD_BOOSTS]
+    metrics = score_configs(candidates, configs, k)
+    scored = time.perf_counter()
+
+    print(f"Collected candidates for {len(queries)} queries in {collected - start:.2f}s, "
+          f"scored {len(configs)} configurations in {scored - collected:.2f}s")
+
+    ranking = np.lexsort((-metrics['ap'], -metrics['ndcg']))[:top]
+    return [{
+        'boosts': configs[i],
+        'baseline': bool(i == 0),
+        'ndcg': float(metrics['ndcg'][i]),
+        'map': float(metrics['ap'][i]),
+        'p_at_k': float(metrics['p_at_k'][i]),
+        'mrr': float(metrics['rr'][i])
+    } for i in ranking]
+
+def main():
+    parser = argparse.ArgumentParser(description="Find field boosts that maximize nDCG on queries.json")
+    parser.add_argument('--index', default="/data/music_index")
+    parser.add_argument('--queries', default="/data/queries.json")
+    parser.add_argument('--space', default=None,
+                        help='JSON file {"field": [values, ...]}: grid values, or ranges with --random')
+    parser.add_argument('--random', type=int, default=0, help="sample this many random configurations instead of a grid")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=200, help="candidates kept per field and query")
+    parser.add_argument('--top', type=int, default=10, help="configurations to report")
+    parser.add_argument('--cache', default=None, help="file to keep candidate scores in between runs")
+    parser.add_argument('--verify', action='store_true', help="replay the best configurations as real searches")
+    parser.add_argument('--output', default=None, help="write the ranking as JSON")
+    args = parser.parse_args()
+
+    space = {}
+    if args.space:
+        with open(args.space, 'r') as f:
+            space = json.load(f)
+    if args.random or not space:
+        configs = list(random_configs(space, args.random or 500))
+    else:
+        configs = list(grid_configs(space))
+
+    if not lucene.getVMEnv():
+        lucene.initVM()
+    searcher = MusicSearcher(args.index, cache_size=0)
+    queries = load_queries(args.queries)
+
+    try:
+        best = tune(searcher, queries, configs, k=args.k, depth=args.depth, top=args.top, cache_file=args.cache)
+
+        print(f"\nTop {len(best)} configurations by nDCG@{args.k}:")
+        for rank, entry in enumerate(best, 1):
+            boosts = ', '.join(f"{field}={entry['boosts'][field]:g}" for field in SEARCH_FIELDS)
+            baseline = " (current defaults)" if entry['baseline'] else ""
+            print(f"{rank}. nDCG {entry['ndcg']:.3f}, MAP {entry['map']:.3f}, "
+                  f"P@{args.k} {entry['p_at_k']:.3f}, MRR {entry['mrr']:.3f}{baseline}")
+            print(f"   {boosts}")
+            if args.verify:
+                replay = evaluate(searcher, queries, k=args.k, boosts=entry['boosts'])['mean']
+                entry['replay'] = replay
+                print(f"   replayed: nDCG {replay['ndcg']:.3f}, MAP {replay['map']:.3f}, "
+                      f"p50 {replay['latency_p50_ms']:.1f} ms")
+    finally:
+        searcher.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(best, f, indent=2)
+
+if __name__ == "__main__":
+    main()
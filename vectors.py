@@ -0,0 +1,132 @@
+"""
+PyLucene Music Search Engine - Document vectors
+Local TF-IDF + LSA embeddings (NumPy only, no downloaded models) for k-NN search
+"""
+import hashlib
+import math
+import os
+import re
+from collections import Counter
+import numpy as np
+
+# Text the vectors are computed from, title-like fields count double
+VECTOR_FIELDS = {
+    'name': 2,
+    'wiki_title': 2,
+    'summary': 1,
+    'wiki_paragraph': 1
+}
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Model file inside the index directory
+MODEL_FILE = 'vectors.npz'
+
+def model_path(index_dir):
+    return os.path.join(index_dir, MODEL_FILE)
+
+def features(text):
+    """Words plus their character trigrams, so "fantasy" and "fantasia" share most features"""
+    for word in TOKEN_PATTERN.findall(text.lower()):
+        yield 'w:' + word
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            yield 't:' + padded[i:i + 3]
+
+def row_features(row):
+    """Feature counts of one CSV row over VECTOR_FIELDS"""
+    counts = Counter()
+    for field, weight in VECTOR_FIELDS.items():
+        for feature in features(row.get(field) or ''):
+            counts[feature] += weight
+    return counts
+
+def top_eigenvectors(matrix, k, oversample=10, iterations=4, seed=42):
+    """Leading k eigenvectors of a symmetric PSD matrix by randomized subspace iteration
+
+    Only needs a few (n x k) products instead of a full eigendecomposition.
+    """
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((matrix.shape[0], min(k + oversample, matrix.shape[0])))
+    for _ in range(iterations):
+        basis, _ = np.linalg.qr(matrix @ basis)
+    # eigh of the small projected matrix returns ascending eigenvalues
+    _, vectors = np.linalg.eigh(basis.T @ matrix @ basis)
+    return (basis @ vectors)[:, ::-1][:, :k]
+
+class VectorModel:
+    """TF-IDF over a fixed vocabulary projected onto its top LSA components
+
+    Vectors are L2-normalized, so their dot product is the cosine similarity.
+    """
+
+    def __init__(self, terms, idf, components):
+        self.terms = list(terms)
+        self.vocabulary = {term: i for i, term in enumerate(self.terms)}
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        # Identifies the model in content hashes: documents are re-encoded when it changes
+        self.model_id = hashlib.sha1(self.components.tobytes()).hexdigest()[:12]
+
+    @property
+    def dims(self):
+        return self.components.shape[1]
+
+    def tfidf(self, counts):
+        """L2-normalized sublinear TF-IDF vector of feature counts"""
+        vector = np.zeros(len(self.terms), dtype=np.float32)
+        for feature, count in counts.items():
+            i = self.vocabulary.get(feature)
+            if i is not None:
+                vector[i] = (1.0 + math.log(count)) * self.idf[i]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def encode_counts(self, counts):
+        """Unit-length LSA vector, None if no feature is in the vocabulary"""
+        vector = self.tfidf(counts) @ self.components
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def encode_row(self, row):
+        return self.encode_counts(row_features(row))
+
+    def encode_text(self, text):
+        return self.encode_counts(Counter(features(text)))
+
+    @classmethod
+    def fit(cls, rows, dims=128, max_features=4096, min_df=2, batch_size=1000):
+        """Fit vocabulary, IDF and LSA components on CSV rows
+
+        The components are the top eigenvectors of the feature covariance
+        X^T X (max_features square), accumulated batch by batch so the dense
+        rows x features matrix X is never built.
+        """
+        docs = [row_features(row) for row in rows]
+        df = Counter()
+        for counts in docs:
+            df.update(counts.keys())
+        terms = sorted((term for term, count in df.items() if count >= min_df), key=lambda term: (-df[term], term))
+        terms = terms[:max_features]
+        idf = np.array([math.log((1.0 + len(docs)) / (1.0 + df[term])) + 1.0 for term in terms], dtype=np.float32)
+
+        model = cls(terms, idf, np.zeros((len(terms), 0), dtype=np.float32))
+        covariance = np.zeros((len(terms), len(terms)), dtype=np.float64)
+        for start in range(0, len(docs), batch_size):
+            batch = np.stack([model.tfidf(counts) for counts in docs[start:start + batch_size]])
+            covariance += batch.T @ batch
+
+        return cls(terms, idf, top_eigenvectors(covariance, min(dims, len(terms))))
+
+    def save(self, path):
+        # Replaced in one step, searchers never load a half-written model
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, terms=np.array(self.terms), idf=self.idf, components=self.components)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['terms'].tolist(), data['idf'], data['components'])